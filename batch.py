@@ -0,0 +1,195 @@
+'''
+Batch module
+
+Runs many seeded headless simulations over a parameter grid on all cores, e.g.
+
+    python batch.py --grid '{"ARCHETYPE_P": [[0.1, 0.3, 0.6], [0.3, 0.3, 0.4]]}' --seeds 16 --weeks 200
+'''
+import argparse
+import csv
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import config
+import mapcache
+from simulation import Simulation
+from town import Town
+
+
+def expandGrid(grid: dict) -> list:
+    '''
+    Expands a parameter grid into the list of all its combinations.
+
+    :param grid: Mapping of constant name to the list of values to try
+    :return: List of override dictionaries
+    '''
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def runOne(overrides: dict, seed: int, weeks: int, generation_type: int, placement: str, cache_dir: str = None) -> dict:
+    '''
+    Generates and runs one headless simulation and summarizes it.
+
+    :param overrides: Constants overriding constants.json for this run
+    :param seed: Seed of the run
+    :param weeks: Number of weeks to simulate
+    :param generation_type: Type of road generation
+    :param placement: Town placement mode
+    :param cache_dir: Map cache directory, None to always generate
+    :return: Summary row of plain values
+    '''
+    cnst = {**config.CNST, **overrides}
+
+    row = {'params': json.dumps(overrides, sort_keys=True), 'seed': seed, 'ok': False}
+    start = time.perf_counter()
+    sim = Simulation.generate(cnst, generation_type, placement, seed, cache_dir)
+    row['generation_seconds'] = time.perf_counter() - start
+    if sim is None:
+        return row
+
+    start = time.perf_counter()
+    sim.run_until(weeks)
+    row['simulation_seconds'] = time.perf_counter() - start
+    return summarize(sim, row)
+
+
+def summarize(sim: Simulation, row: dict) -> dict:
+    '''
+    Adds the end state of a run to its summary row.
+
+    :param sim: Finished simulation
+    :param row: Summary row to complete
+    :return: The completed row
+    '''
+    towns = sim.towns
+    row.update({
+        'ok': True,
+        'weeks': sim.weeks,
+        'towns': len(towns),
+        'roads': len(towns.roads),
+        'alive': int(towns.isAlive.sum()),
+        'population': int(towns.population.sum()),
+        'saldo': float(towns.saldo.sum()),
+        'food': float(towns.warehouse[:, 0].sum()),
+        'goods': float(towns.warehouse[:, 1].sum()),
+    })
+    for code, name in enumerate(Town.archetypes):
+        mask = towns.archetype == code
+        row[f'population_{name}'] = int(towns.population[mask].sum())
+        row[f'alive_{name}'] = int(towns.isAlive[mask].sum())
+    return row
+
+
+def runForked(combinations: list, seed: int, fork_week: int, weeks: int, generation_type: int, placement: str, cache_dir: str = None) -> list:
+    '''
+    Runs one seed with the base constants up to fork_week, then forks it into one child run
+    per combination, so the shared prefix is simulated once.
+
+    :param combinations: List of override dictionaries, applied from fork_week on
+    :param seed: Seed of the run
+    :param fork_week: Week at which the runs branch
+    :param weeks: Number of weeks to simulate per run
+    :param generation_type: Type of road generation
+    :param placement: Town placement mode
+    :param cache_dir: Map cache directory, None to always generate
+    :return: Summary rows in combination order
+    '''
+    start = time.perf_counter()
+    base = Simulation.generate(dict(config.CNST), generation_type, placement, seed, cache_dir)
+    generation_seconds = time.perf_counter() - start
+    if base is None:
+        return [{'params': json.dumps(overrides, sort_keys=True), 'seed': seed, 'ok': False} for overrides in combinations]
+
+    start = time.perf_counter()
+    base.run_until(fork_week)
+    prefix_seconds = time.perf_counter() - start
+
+    rows = []
+    for overrides, child in zip(combinations, base.fork(len(combinations), combinations)):
+        row = {'params': json.dumps(overrides, sort_keys=True), 'seed': seed, 'ok': False, 'generation_seconds': generation_seconds,
+               'fork_week': fork_week, 'prefix_seconds': prefix_seconds}
+        start = time.perf_counter()
+        child.run_until(weeks)
+        row['simulation_seconds'] = time.perf_counter() - start
+        rows.append(summarize(child, row))
+    return rows
+
+
+def _runTask(task: tuple) -> dict:
+    return runOne(*task)
+
+
+def _runForkedTask(task: tuple) -> list:
+    return runForked(*task)
+
+
+def runBatch(grid: dict, seeds: list, weeks: int, generation_type: int = 4, placement: str = 'poisson', workers: int = None, cache_dir: str = None, fork_week: int = None) -> list:
+    '''
+    Runs every combination of the grid with every seed across a process pool.
+
+    :param grid: Mapping of constant name to the list of values to try
+    :param seeds: List of seeds
+    :param weeks: Number of weeks to simulate per run
+    :param generation_type: Type of road generation
+    :param placement: Town placement mode
+    :param workers: Number of processes, defaults to the CPU count
+    :param cache_dir: Map cache directory, None to always generate
+    :param fork_week: If set, every seed runs with the base constants up to this week once and
+        the combinations branch from there (see runForked)
+    :return: Results table, one summary row per run in (combination, seed) order
+    '''
+    combinations = expandGrid(grid)
+    workers = workers or os.cpu_count() or 1
+    if fork_week is not None:
+        tasks = [(combinations, seed, fork_week, weeks, generation_type, placement, cache_dir) for seed in seeds]
+        if workers == 1:
+            per_seed = [_runForkedTask(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(workers) as pool:
+                per_seed = list(pool.map(_runForkedTask, tasks))
+        return [per_seed[s][c] for c in range(len(combinations)) for s in range(len(seeds))]
+
+    tasks = [(overrides, seed, weeks, generation_type, placement, cache_dir) for overrides in combinations for seed in seeds]
+    if workers == 1:
+        return [_runTask(task) for task in tasks]
+    with ProcessPoolExecutor(workers) as pool:
+        return list(pool.map(_runTask, tasks))
+
+
+def writeCsv(results: list, path: str) -> None:
+    '''
+    Writes a results table as CSV.
+
+    :param results: Rows returned by runBatch
+    :param path: Output file
+    :return: None
+    '''
+    columns = list(dict.fromkeys(key for row in results for key in row))
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(results)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run seeded headless simulations over a parameter grid.')
+    parser.add_argument('--grid', default='{}', help='JSON mapping of constant name to list of values')
+    parser.add_argument('--seeds', type=int, default=8, help='number of seeds per combination')
+    parser.add_argument('--weeks', type=int, default=100)
+    parser.add_argument('--generation-type', type=int, default=4)
+    parser.add_argument('--placement', default='poisson')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--out', default='batch_results.csv')
+    parser.add_argument('--cache', action='store_true', help='load and store maps in the map cache')
+    parser.add_argument('--fork-week', type=int, default=None, help='simulate each seed once up to this week and branch the combinations from there')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = runBatch(json.loads(args.grid), list(range(args.seeds)), args.weeks, args.generation_type, args.placement, args.workers,
+                       mapcache.CACHE_DIR if args.cache else None, args.fork_week)
+    writeCsv(results, args.out)
+    print(f"{len(results)} runs in {time.perf_counter() - start:.2f} s, results written to {args.out}")
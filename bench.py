@@ -0,0 +1,216 @@
+'''
+Benchmark module
+
+Times every map generation stage and the town/road drawing across map sizes with fixed
+seeds, writes the timings as JSON and compares them with a stored baseline, e.g.
+
+    python bench.py                      # run and compare with bench_baseline.json
+    python bench.py --save-baseline      # run and store the timings as the new baseline
+'''
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')  # draw benchmarks need no window
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import numpy as np
+
+import builder
+from delaunay import delaunayEdges
+from roads import Connectivity
+from spatial import PointGrid, SegmentGrid
+
+SIZES = [32, 100, 316, 1000, 3162, 10000]
+NAIVE_LIMIT = 1000  # largest map triangulated with the naive Bowyer-Watson
+AREA_PER_TOWN = 1250 * 800 / 32  # keeps the town density of the default map
+SEED = 1
+BASELINE = 'bench_baseline.json'
+TOLERANCE = 1.5  # slowdown factor reported as a regression
+EXPONENT_TOLERANCE = 0.3  # growth of the scaling exponent reported as a regression
+MIN_SECONDS = 0.05  # timings below this are too noisy to compare
+
+
+def timeit(function, repeat: int) -> float:
+    '''
+    Best wall time of several calls.
+
+    :param function: Function without arguments
+    :param repeat: Number of calls
+    :return: Seconds of the fastest call
+    '''
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def mapSide(n: int) -> int:
+    '''
+    Side of the square map holding n towns at the default density.
+
+    :param n: Number of towns
+    :return: Map width and height
+    '''
+    return int(math.sqrt(n * AREA_PER_TOWN))
+
+
+def benchSize(n: int, repeat: int) -> dict:
+    '''
+    Times every stage on one map size.
+
+    :param n: Number of towns
+    :param repeat: Calls per stage
+    :return: Mapping of stage name to seconds
+    '''
+    cnst = builder.CNST
+    side = mapSide(n)
+    args = (n, cnst['START_POPULATION'], cnst['START_WAREHOUSE'], cnst['POP_CF'], side, side)
+    results = {}
+
+    results['initializeTowns'] = timeit(lambda: builder.initializeTowns(*args, 'poisson', builder.makeRng(SEED)), repeat)
+    towns = builder.initializeTowns(*args, 'poisson', builder.makeRng(SEED))
+
+    results['delaunayEdges'] = timeit(lambda: delaunayEdges(towns.x, towns.y), repeat)
+    if n <= NAIVE_LIMIT:
+        results['delaunay_edges'] = timeit(lambda: builder.delaunay_edges(towns), repeat)
+    edges = delaunayEdges(towns.x, towns.y)
+
+    def filterRoads():
+        for a in range(n):
+            towns.roads.clear(a)
+        span = max(int(np.ptp(towns.x)), int(np.ptp(towns.y)), 1)
+        crossings = SegmentGrid(towns.x.tolist(), towns.y.tolist(), max(cnst['NB_ZONE_ROAD'], span / math.sqrt(n)))
+        towns.roads.observers.append(crossings)
+        builder.addValidRoads(towns, edges, PointGrid(towns.x, towns.y, cnst['NB_ZONE_ROAD']), crossings)
+        towns.roads.observers.remove(crossings)
+        return crossings
+
+    results['addValidRoads'] = timeit(filterRoads, repeat)
+    crossings = filterRoads()
+    results['noAnyIntersections'] = timeit(crossings.anyCrossing, repeat)
+    results['checkForConnectivity'] = timeit(lambda: Connectivity(towns.roads).isConnected(), repeat)
+
+    results['initializeMap'] = timeit(lambda: builder.initializeMap(*args, 4, placement='poisson', seed=SEED), repeat)
+
+    import pygame
+    import draws
+    from viewport import Camera
+    pygame.init()
+    screen = pygame.display.set_mode((1250, 800))
+    camera = Camera(*screen.get_size())
+    camera.fit(side, side)
+    towns = builder.initializeMap(*args, 4, placement='poisson', seed=SEED)
+    draws.townSprites()
+    results['drawRoads'] = timeit(lambda: draws.drawRoads(screen, towns, camera), repeat)
+    results['drawTowns'] = timeit(lambda: draws.drawTowns(screen, towns, camera), repeat)
+    return results
+
+
+def exponent(timings: dict, sizes: list) -> float | None:
+    '''
+    Empirical scaling exponent of a stage: the slope of log(seconds) over log(towns) between
+    the two largest of the given sizes.
+
+    :param timings: Mapping of town count to seconds
+    :param sizes: Town counts to choose from (strings, as in the reports)
+    :return: Exponent, None with fewer than two sizes or timings below MIN_SECONDS
+    '''
+    sizes = sorted(sizes, key=int)
+    if len(sizes) < 2:
+        return None
+    a, b = sizes[-2], sizes[-1]
+    ta, tb = timings[a], timings[b]
+    if ta < MIN_SECONDS or tb < MIN_SECONDS:
+        return None
+    return math.log(tb / ta) / math.log(int(b) / int(a))
+
+
+def exponents(results: dict) -> dict:
+    '''
+    Scaling exponent of every stage between the two largest sizes it was timed on.
+
+    :param results: Mapping of stage name to {town count: seconds}
+    :return: Mapping of stage name to exponent
+    '''
+    slopes = {stage: exponent(timings, list(timings)) for stage, timings in results.items()}
+    return {stage: slope for stage, slope in slopes.items() if slope is not None}
+
+
+def runBench(sizes: list, repeat: int = 3) -> dict:
+    '''
+    Runs the whole suite.
+
+    :param sizes: Town counts to benchmark
+    :param repeat: Calls per stage, the fastest one counts
+    :return: Report with the environment, timings per stage and size, and scaling exponents
+    '''
+    results = {}
+    for n in sizes:
+        for stage, seconds in benchSize(n, repeat).items():
+            results.setdefault(stage, {})[str(n)] = seconds
+        print(f"{n} towns done")
+    return {
+        'environment': {'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(), 'seed': SEED, 'repeat': repeat},
+        'results': results,
+        'exponents': exponents(results),
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float = TOLERANCE) -> list:
+    '''
+    Compares a report with a baseline report.
+
+    :param report: Report from runBench
+    :param baseline: Stored report
+    :param tolerance: Slowdown factor reported as a regression
+    :return: List of regression descriptions, empty if there are none
+    '''
+    regressions = []
+    for stage, timings in report['results'].items():
+        for n, seconds in timings.items():
+            before = baseline['results'].get(stage, {}).get(n)
+            if before is None or max(seconds, before) < MIN_SECONDS:
+                continue
+            if seconds > before * tolerance:
+                regressions.append(f"{stage} at {n} towns: {before * 1000:.1f} ms -> {seconds * 1000:.1f} ms ({seconds / before:.2f}x)")
+    for stage, timings in report['results'].items():
+        # exponents depend on the sizes, so both are taken over the sizes both reports timed
+        old_timings = baseline['results'].get(stage, {})
+        common = [n for n in timings if n in old_timings]
+        slope, before = exponent(timings, common), exponent(old_timings, common)
+        if slope is not None and before is not None and slope > before + EXPONENT_TOLERANCE:
+            regressions.append(f"{stage} scaling: O(n^{before:.2f}) -> O(n^{slope:.2f})")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark map generation and rendering.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--out', default='bench_results.json')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the baseline')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    report = runBench(args.sizes, args.repeat)
+    with open(args.baseline if args.save_baseline else args.out, 'w') as f:
+        json.dump(report, f, indent=4)
+
+    for stage, timings in report['results'].items():
+        print(f"{stage:22}" + ''.join(f"{n:>8}: {seconds * 1000:9.2f} ms" for n, seconds in timings.items()))
+    if args.save_baseline or not os.path.exists(args.baseline):
+        sys.exit(0)
+
+    with open(args.baseline) as f:
+        regressions = compare(report, json.load(f), args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    sys.exit(1 if regressions else 0)
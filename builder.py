@@ -1,17 +1,34 @@
-import json
+import logging
 import math
 import random
 
-from numpy.random import choice
+import numpy as np
 
-from town import Town
+import profiler
+from config import CNST
+from delaunay import delaunayEdges, hilbertOrder
+from roads import Connectivity
+from spatial import PointGrid, SegmentGrid, kMeans, poissonDisk
+from town import Town, TownTable
 
-with open('constants.json', 'r') as f:
-    CNST = json.load(f)
+logger = logging.getLogger(__name__)
 
 
+def makeRng(seed: int = None, stream: str = 'map') -> random.Random:
+    '''
+    Creates the random generator of one stream of a seeded run. Every random choice of
+    map generation comes from the 'map' stream, so one seed reproduces the whole map.
+    
+    :param seed: Seed of the run, None for a nondeterministic generator
+    :param stream: Name of the stream
+    :return: random.Random object
+    '''
+    if seed is None:
+        return random.Random()
+    return random.Random(f"{seed}/{stream}")
 
-def initializeTowns(num_towns: int, start_population: int, start_warehouse: list, pop_cf: float, width: int, height: int) -> list:
+
+def initializeTowns(num_towns: int, start_population: int, start_warehouse: list, pop_cf: float, width: int, height: int, placement: str = 'rejection', rng: random.Random = None, cnst: dict = None) -> TownTable:
     '''
     Initializes a list of Town objects with random positions and properties.
     
@@ -21,45 +38,51 @@ def initializeTowns(num_towns: int, start_population: int, start_warehouse: list
     :param pop_cf: Population variation coefficient
     :param width: Map width
     :param height: Map height
-    :return: List of Town objects or None if placement fails
+    :param placement: 'rejection' — random positions retried on overlap,
+        'poisson' — Poisson-disk sampling with guaranteed spacing
+    :param rng: Random generator, see makeRng
+    :param cnst: Constants dictionary, defaults to constants.json
+    :return: TownTable of towns or None if placement fails
     '''
-    towns = []
+    rng = rng or makeRng()
+    cnst = cnst if cnst is not None else CNST
+    towns = TownTable(num_towns, len(start_warehouse))
     have_main = False
 
+    if placement == 'poisson':
+        positions = poissonDisk(num_towns, width, height, cnst['NB_ZONE_TOWN'], cnst['NB_ZONE_BORDER'], rng)
+        if positions is None:
+            return None  # Map is too small for the requested spacing
+
     for town in range(num_towns):
 
-        name = town
-        population = int(start_population + start_population * random.uniform(pop_cf, -pop_cf))
-        warehouse = start_warehouse.copy()
-        roads = []
-        attempts = 0
+        population = int(start_population + start_population * rng.uniform(pop_cf, -pop_cf))
         isAlive = True
-        road_count = 0
-        agentType = choice(Town.archetypes, p = [0.1, 0.3, 0.6])
-
-        while attempts < 100:
-            if have_main is False:
-                isMain = True
-                have_main = True
-            x = random.randint(0, width)
-            y = random.randint(0, height)
-            valid = True
-            for other in towns:
-                if abs(x - other.x) < CNST['NB_ZONE_TOWN'] or abs(y - other.y) < CNST['NB_ZONE_TOWN']:
+        agentType = rng.choices(Town.archetypes, weights = cnst['ARCHETYPE_P'])[0]
+
+        if placement == 'poisson':
+            x, y = positions[town]
+        else:
+            attempts = 0
+            while attempts < 100:
+                if have_main is False:
+                    isMain = True
+                    have_main = True
+                x = rng.randint(0, width)
+                y = rng.randint(0, height)
+                valid = not np.any((np.abs(towns.x - x) < cnst['NB_ZONE_TOWN']) | (np.abs(towns.y - y) < cnst['NB_ZONE_TOWN']))
+                if x < cnst['NB_ZONE_BORDER'] or x > width - cnst['NB_ZONE_BORDER'] or y < cnst['NB_ZONE_BORDER'] or y > height - cnst['NB_ZONE_BORDER']:
                     valid = False
+                if valid:
                     break
-            if x < CNST['NB_ZONE_BORDER'] or x > width - CNST['NB_ZONE_BORDER'] or y < CNST['NB_ZONE_BORDER'] or y > height - CNST['NB_ZONE_BORDER']:
-                valid = False
-            if valid:
-                break
-            attempts += 1
-        if attempts >= 100:
-            return None  # Failed to place towns without overlap
+                attempts += 1
+            if attempts >= 100:
+                return None  # Failed to place towns without overlap
         isMain = (town == 0)
-        towns.append(Town(name, population, warehouse, roads, road_count, x, y, isMain, isAlive, agentType))
+        towns.add(population, start_warehouse, x, y, isMain, isAlive, agentType)
     return towns
 
-def initializeMap(num_towns: int, start_population: int, start_warehouse: list, pop_cf: float, width: int, height: int, generation_type: int) -> list:
+def initializeMap(num_towns: int, start_population: int, start_warehouse: list, pop_cf: float, width: int, height: int, generation_type: int, triangulation: str = 'incremental', placement: str = 'rejection', seed: int = None, cnst: dict = None) -> TownTable:
     '''
     Build map
 
@@ -70,248 +93,101 @@ def initializeMap(num_towns: int, start_population: int, start_warehouse: list,
     :param width: Map width
     :param height: Map height
     :param generation_type: Type of road generation
-    :return: List of fully connected Town objects
+    :param triangulation: Delaunay triangulator for generation type 4, 'incremental' or 'bowyer-watson'
+    :param placement: Town placement mode, 'rejection' or 'poisson'
+    :param seed: Seed driving every random choice of the generation, None for a random map
+    :param cnst: Constants dictionary, defaults to constants.json
+    :return: TownTable of fully connected towns
     '''
+    rng = makeRng(seed)
     max_retries = 500
     attempt = 0
     
     while attempt < max_retries:
         attempt += 1
-        print(f"Map generation attempt {attempt}/{max_retries}")
+        logger.debug("Map generation attempt %d/%d", attempt, max_retries)
         
         # Reinitialize town positions
-        towns = initializeTowns(num_towns, start_population, start_warehouse, pop_cf, width, height)
+        with profiler.timer('placement'):
+            towns = initializeTowns(num_towns, start_population, start_warehouse, pop_cf, width, height, placement, rng, cnst)
         if towns is None:
-            print("Failed to place towns without overlap. Retrying...")
+            profiler.count('retries')
+            logger.info("Failed to place towns without overlap. Retrying...")
             continue
         
         # Try to generate roads
-        success = initializeRoads(towns, generation_type)
+        with profiler.timer('roads'):
+            success = initializeRoads(towns, generation_type, triangulation, rng, cnst)
         if success:
-            print(f"Map generated successfully on attempt {attempt}")
+            logger.info("Map generated successfully on attempt %d", attempt)
             return towns
         else:
-            print(f"Failed to generate fully-connected map on attempt {attempt}. Reinitializing town positions...")
+            profiler.count('retries')
+            logger.info("Failed to generate fully-connected map on attempt %d. Reinitializing town positions...", attempt)
     
-    print(f"Failed to generate fully-connected map after {max_retries} attempts")
+    logger.error("Failed to generate fully-connected map after %d attempts", max_retries)
     return None
 
-def initializeRoads(towns: list, generation_type: int) -> bool:
+def initializeRoads(towns: TownTable, generation_type: int, triangulation: str = 'incremental', rng: random.Random = None, cnst: dict = None) -> bool:
     '''
     Initializing roads between towns
     
-    :param towns: List of towns (Town objects)
-    :type towns: list
-    :param generation_type: 1 — random, 2 — hubs, 3 — one line
+    :param towns: Table of towns
+    :type towns: TownTable
+    :param generation_type: 1 — random, 2 — hubs, 3 — one line, 4 — Delaunay triangulation
     :type generation_type: int
+    :param triangulation: 'incremental' — O(n log n) triangulator from the delaunay module,
+        'bowyer-watson' — naive reference implementation below
+    :type triangulation: str
+    :param rng: Random generator, see makeRng
+    :type rng: random.Random
+    :param cnst: Constants dictionary, defaults to constants.json
+    :type cnst: dict
     :return: True if successful, False otherwise
     '''
+    rng = rng or makeRng()
+    cnst = cnst if cnst is not None else CNST
 
     min_road_quantity = len(towns) + 2
     max_road_quantity = int(len(towns) * 1.3)
 
-    def checkForConnectivity(towns: list) -> bool:
+    # Spatial index of the roads, kept in sync with the network while roads are built
+    span = max(int(towns.x.max()) - int(towns.x.min()), int(towns.y.max()) - int(towns.y.min()), 1)
+    crossings = SegmentGrid(towns.x.tolist(), towns.y.tolist(), max(cnst['NB_ZONE_ROAD'], span / math.sqrt(len(towns))))
+    for a, b in towns.roads.edges.tolist():
+        crossings.insert(a, b)
+    towns.roads.observers.append(crossings)
+    clearance = PointGrid(towns.x, towns.y, cnst['NB_ZONE_ROAD'])
+    connectivity = Connectivity(towns.roads)
+    towns.roads.observers.append(connectivity)
+    edges = None
+
+    def checkForConnectivity(towns: TownTable) -> bool:
         '''
         Checks if all towns are connected via roads (graph is connected).
         
-        :param towns: List of Town objects
+        :param towns: TownTable of towns
         :return: True if connected, False otherwise
         '''
-        visited = set()
-
-        def dfs(town: Town):
-            visited.add(town)
-            for neighbor in town.roads:
-                if neighbor not in visited:
-                    dfs(neighbor)
-
-        dfs(towns[0])
-        return len(visited) == len(towns)
+        return connectivity.isConnected()
     
-    def checkForIntersection(p1, p2, p3, p4):
-        '''
-        Checks if two line segments intersect.
-        
-        :param p1: First point of first segment
-        :param p2: Second point of first segment
-        :param p3: First point of second segment
-        :param p4: Second point of second segment
-        :return: True if they intersect, False otherwise
-        '''
-
-        def cp(o, a, b):
-            return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
-
-        check1 = cp(p1, p2, p3) * cp(p1, p2, p4) < 0
-        check2 = cp(p3, p4, p1) * cp(p3, p4, p2) < 0
-
-        return check1 and check2
-    
-    def noAnyIntersections(towns: list) -> bool:
+    def noAnyIntersections(towns: TownTable) -> bool:
         ''' 
         Check if any roads intersect 
         
-        :param towns: List of Town objects
+        :param towns: TownTable of towns
         :return: True if no intersections, False otherwise
         '''
-        edges = []
-        seen = set()
-
-        for t1 in towns:
-            for t2 in t1.roads:
-                edge_id = frozenset((t1, t2))
-                if edge_id not in seen:
-                    seen.add(edge_id)
-                    edges.append((t1, t2))
-
-        for i, (a1, a2) in enumerate(edges):
-            p1 = (a1.x, a1.y)
-            p2 = (a2.x, a2.y)
-
-            for b1, b2 in edges[i + 1:]:
-
-                if {a1, a2} & {b1, b2}:
-                    continue
-
-                p3 = (b1.x, b1.y)
-                p4 = (b2.x, b2.y)
-
-                if checkForIntersection(p1, p2, p3, p4):
-                    return False
-
-        return True
-
-    def checkDistance(px, py, x1, y1, x2, y2):
-        '''
-        Checks if a point is too close to a line segment.
-        
-        :param px: X of point
-        :param py: Y of point
-        :param x1: X of line start
-        :param y1: Y of line start
-        :param x2: X of line end
-        :param y2: Y of line end
-        :return: True if too close, False otherwise
-        '''
-        dx = x2 - x1
-        dy = y2 - y1
-        denom = dx * dx + dy * dy
-        if denom == 0:
-            distance = math.hypot(px - x1, py - y1)
-        else:
-            t = ((px - x1) * dx + (py - y1) * dy) / denom
-            t = max(0.0, min(1.0, t))  
-            nx = x1 + t * dx
-            ny = y1 + t * dy
-            distance = math.hypot(px - nx, py - ny)
-        if distance <= CNST['NB_ZONE_ROAD']:
-            return True
-        else:
-            return False
-
-    def checkMaxLength(town1: Town, town2: Town) -> bool:
-        '''
-        Checks if the distance between two towns is within the maximum road length.
-        
-        :param town1: First town
-        :param town2: Second town
-        :return: True if within limit, False otherwise
-        '''
-        distance = math.hypot(town1.x - town2.x, town1.y - town2.y)
-        if distance <= CNST['MAX_ROAD_LENGTH']:
-            return True
-        else:
-            return False
-
-    def delaunay_edges(towns: list) -> set:
-        '''
-        Return set of edges (index pairs) from Delaunay triangulation using Bowyer-Watson.
-        
-        :param towns: List of Town objects
-        :return: Set of edge tuples
-        '''
-        if len(towns) < 2:
-            return set()
-
-        points = [(t.x, t.y) for t in towns]
-        n = len(points)
-
-        xs = [p[0] for p in points]
-        ys = [p[1] for p in points]
-        minx, maxx = min(xs), max(xs)
-        miny, maxy = min(ys), max(ys)
-        dx = maxx - minx
-        dy = maxy - miny
-        delta = max(dx, dy) * 10.0 + 1.0
-        cx = (minx + maxx) / 2.0
-        cy = (miny + maxy) / 2.0
-
-        super_pts = [ (cx - 2*delta, cy - delta), (cx, cy + 2*delta), (cx + 2*delta, cy - delta) ]
-        all_points = points + super_pts
-
-        triangles = [(n, n+1, n+2)]
-
-        def circumcenter(a, b, c):
-            (x1, y1), (x2, y2), (x3, y3) = a, b, c
-            d = 2 * (x1*(y2-y3) + x2*(y3-y1) + x3*(y1-y2))
-            if abs(d) < 1e-12:
-                return None, None
-            ux = ((x1*x1 + y1*y1)*(y2 - y3) + (x2*x2 + y2*y2)*(y3 - y1) + (x3*x3 + y3*y3)*(y1 - y2)) / d
-            uy = ((x1*x1 + y1*y1)*(x3 - x2) + (x2*x2 + y2*y2)*(x1 - x3) + (x3*x3 + y3*y3)*(x2 - x1)) / d
-            return ux, uy
-
-        def in_circumcircle(pt, tri):
-            a = all_points[tri[0]]
-            b = all_points[tri[1]]
-            c = all_points[tri[2]]
-            center = circumcenter(a, b, c)
-            if center[0] is None:
-                return False
-            ux, uy = center
-            r2 = (ux - a[0])**2 + (uy - a[1])**2
-            return (pt[0] - ux)**2 + (pt[1] - uy)**2 <= r2 + 1e-8
-
-        for i in range(n):
-            pt = all_points[i]
-            bad = []
-            for tri in triangles:
-                if in_circumcircle(pt, tri):
-                    bad.append(tri)
-
-            polygon = []
-            for tri in bad:
-                for edge in [(tri[0], tri[1]), (tri[1], tri[2]), (tri[2], tri[0])]:
-                    rev = (edge[1], edge[0])
-                    if rev in polygon:
-                        polygon.remove(rev)
-                    else:
-                        polygon.append(edge)
-
-            for tri in bad:
-                if tri in triangles:
-                    triangles.remove(tri)
-
-            for edge in polygon:
-                triangles.append((edge[0], edge[1], i))
-
-        triangles = [t for t in triangles if all(v < n for v in t)]
-
-        edges = set()
-        for tri in triangles:
-            for a, b in [(tri[0], tri[1]), (tri[1], tri[2]), (tri[2], tri[0])]:
-                if a < n and b < n:
-                    edges.add(tuple(sorted((a, b))))
-
-        return edges
+        return not crossings.anyCrossing()
 
     match generation_type:
         case 1:  # Random 
             attempts = 0
             total_roads = 0
-            road_quantity = random.randint(min_road_quantity, max_road_quantity)
+            road_quantity = rng.randint(min_road_quantity, max_road_quantity)
             while attempts < 100000000:
                 attempts += 1
-                print('Attempting road generation, attempt number:', attempts)
+                logger.debug('Attempting road generation, attempt number: %d', attempts)
                 if total_roads >= road_quantity and checkForConnectivity(towns) and noAnyIntersections(towns):
                     break
                 else:
@@ -321,67 +197,257 @@ def initializeRoads(towns: list, generation_type: int) -> bool:
                     for town in towns:
                         attemps_create_road = 0
                         if road_quantity - total_roads >= 8:
-                            potential_roads = random.randint(1, 4)
+                            potential_roads = rng.randint(1, 4)
                         else:
-                            potential_roads = random.randint(1, 3)
+                            potential_roads = rng.randint(1, 3)
                         while (len(town.roads) < potential_roads):
-                            other_town = random.choice(towns)
+                            other_town = rng.choice(towns)
                             if other_town != town and other_town not in town.roads:
                                 town.appendRoad(other_town)
                                 total_roads += 1    
 
-                    delete_random = random.randint(3, min_road_quantity // 2)
+                    delete_random = rng.randint(3, min_road_quantity // 2)
                     for _ in range(delete_random):
-                        town = random.choice(towns)
+                        town = rng.choice(towns)
                         if town.roads:
-                            town.removeRoad(random.choice(town.roads))
-
-                    for town in towns:
-                        for other in towns:
-                            if other != town:
-                                for under_check_town in towns:
-                                    if under_check_town != town and under_check_town != other:
-                                        if checkDistance(under_check_town.x, under_check_town.y, town.x, town.y, other.x, other.y):
-                                            town.removeRoad(other)
+                            town.removeRoad(rng.choice(town.roads))
+
+                    for a, b in towns.roads.edges.tolist():
+                        with profiler.timer('clearance'):
+                            blocked = clearance.segmentBlocked(a, b, cnst['NB_ZONE_ROAD'])
+                        if blocked:
+                            towns.roads.remove(a, b)
+            profiler.count('road_attempts', attempts)
                                             
         case 2:  # Hubs
-            # To be implemented
-            pass
+            with profiler.timer('triangulation'):
+                edges = delaunayEdges(towns.x, towns.y)
+            for t in towns:
+                t.clearRoads()
+
+            # Towns nearest the k-means centres become the Main towns of their catchments.
+            # k = sqrt(n) makes k-means O(n^1.5) per iteration, below the triangulation up to 10k towns
+            with profiler.timer('clustering'):
+                labels, cx, cy = kMeans(towns.x, towns.y, round(math.sqrt(len(towns))), rng)
+                offset = np.hypot(towns.x - cx[labels], towns.y - cy[labels])
+                order = np.lexsort((offset, labels))
+                first = np.ones(len(order), dtype=bool)
+                first[1:] = labels[order[1:]] != labels[order[:-1]]
+            towns.isMain[:] = False
+            towns.isMain[order[first]] = True
+            towns.mainVersion += 1
+
+            # Shortest valid roads first: a spanning tree inside every catchment, then the
+            # shortest roads joining neighbouring catchments
+            labels = labels.tolist()
+            local = {(a, b) for a, b in edges if labels[a] == labels[b]}
+            repairConnectivity(towns, local, connectivity, crossings, clearance, cnst)
+            repairConnectivity(towns, edges, connectivity, crossings, clearance, cnst)
         case 3:  # One line
-            # To be implemented
-            pass
+            with profiler.timer('triangulation'):
+                edges = delaunayEdges(towns.x, towns.y)
+            for t in towns:
+                t.clearRoads()
+
+            # Towns are chained in Hilbert curve order; links that are not Delaunay edges are
+            # left out and the pieces are joined by the shortest valid roads below
+            order = hilbertOrder(towns.x, towns.y).tolist()
+            chain = {(a, b) if a < b else (b, a) for a, b in zip(order, order[1:])}
+            addValidRoads(towns, chain & edges, clearance, crossings, cnst)
         case 4:  # Delaunay triangulation
-            edges = delaunay_edges(towns)
+            with profiler.timer('triangulation'):
+                if triangulation == 'bowyer-watson':
+                    edges = delaunay_edges(towns)
+                else:
+                    edges = delaunayEdges(towns.x, towns.y)
             for t in towns:
                 t.clearRoads()
 
-            for a, b in edges:
-                ta = towns[a]
-                tb = towns[b]
-                if not checkMaxLength(ta, tb):
-                    continue
-                
-                skip_road = False
-                for other_town in towns:
-                    if other_town != ta and other_town != tb:
-                        if checkDistance(other_town.x, other_town.y, ta.x, ta.y, tb.x, tb.y):
-                            skip_road = True
-                            break
-                if skip_road:
-                    continue
-                
-                ta.appendRoad(tb)
-                
-                if not noAnyIntersections(towns):
-                    ta.removeRoad(tb)
-                    continue
-
-            for town in random.choices(towns, k = len(towns) // 2):
+            addValidRoads(towns, edges, clearance, crossings, cnst)
+
+            for town in rng.choices(towns, k = len(towns) // 2):
                 if town.roads:
-                    town.removeRoad(random.choice(town.roads))
+                    town.removeRoad(rng.choice(town.roads))
+
+    if not checkForConnectivity(towns):
+        if edges is None:
+            with profiler.timer('triangulation'):
+                edges = delaunayEdges(towns.x, towns.y)
+        profiler.count('repairs')
+        repairConnectivity(towns, edges, connectivity, crossings, clearance, cnst)
+
+    success = checkForConnectivity(towns) and noAnyIntersections(towns)
+    towns.roads.observers.remove(crossings)
+    towns.roads.observers.remove(connectivity)
+    return success
+
+def delaunay_edges(towns: list) -> set:
+    '''
+    Return set of edges (index pairs) from Delaunay triangulation using Bowyer-Watson.
+    
+    :param towns: List of Town objects
+    :return: Set of edge tuples
+    '''
+    if len(towns) < 2:
+        return set()
+
+    points = [(t.x, t.y) for t in towns]
+    n = len(points)
+
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    minx, maxx = min(xs), max(xs)
+    miny, maxy = min(ys), max(ys)
+    dx = maxx - minx
+    dy = maxy - miny
+    delta = max(dx, dy) * 10.0 + 1.0
+    cx = (minx + maxx) / 2.0
+    cy = (miny + maxy) / 2.0
+
+    super_pts = [ (cx - 2*delta, cy - delta), (cx, cy + 2*delta), (cx + 2*delta, cy - delta) ]
+    all_points = points + super_pts
+
+    triangles = [(n, n+1, n+2)]
+
+    def circumcenter(a, b, c):
+        (x1, y1), (x2, y2), (x3, y3) = a, b, c
+        d = 2 * (x1*(y2-y3) + x2*(y3-y1) + x3*(y1-y2))
+        if abs(d) < 1e-12:
+            return None, None
+        ux = ((x1*x1 + y1*y1)*(y2 - y3) + (x2*x2 + y2*y2)*(y3 - y1) + (x3*x3 + y3*y3)*(y1 - y2)) / d
+        uy = ((x1*x1 + y1*y1)*(x3 - x2) + (x2*x2 + y2*y2)*(x1 - x3) + (x3*x3 + y3*y3)*(x2 - x1)) / d
+        return ux, uy
+
+    def in_circumcircle(pt, tri):
+        a = all_points[tri[0]]
+        b = all_points[tri[1]]
+        c = all_points[tri[2]]
+        center = circumcenter(a, b, c)
+        if center[0] is None:
+            return False
+        ux, uy = center
+        r2 = (ux - a[0])**2 + (uy - a[1])**2
+        return (pt[0] - ux)**2 + (pt[1] - uy)**2 <= r2 + 1e-8
+
+    for i in range(n):
+        pt = all_points[i]
+        bad = []
+        for tri in triangles:
+            if in_circumcircle(pt, tri):
+                bad.append(tri)
+
+        polygon = []
+        for tri in bad:
+            for edge in [(tri[0], tri[1]), (tri[1], tri[2]), (tri[2], tri[0])]:
+                rev = (edge[1], edge[0])
+                if rev in polygon:
+                    polygon.remove(rev)
+                else:
+                    polygon.append(edge)
+
+        for tri in bad:
+            if tri in triangles:
+                triangles.remove(tri)
+
+        for edge in polygon:
+            triangles.append((edge[0], edge[1], i))
+
+    triangles = [t for t in triangles if all(v < n for v in t)]
+
+    edges = set()
+    for tri in triangles:
+        for a, b in [(tri[0], tri[1]), (tri[1], tri[2]), (tri[2], tri[0])]:
+            if a < n and b < n:
+                edges.add(tuple(sorted((a, b))))
 
-    if checkForConnectivity(towns) and noAnyIntersections(towns):
+    return edges
+
+def addValidRoads(towns: TownTable, candidates: set, clearance: PointGrid, crossings: SegmentGrid, cnst: dict = None) -> int:
+    '''
+    Adds every candidate road that is within the maximum road length, keeps clear of the
+    other towns and crosses no existing road.
+    
+    :param towns: Table of towns
+    :param candidates: Set of (town ID, town ID) candidate roads
+    :param clearance: Point grid of the towns
+    :param crossings: Segment grid attached to the road network
+    :param cnst: Constants dictionary, defaults to constants.json
+    :return: Number of roads added
+    '''
+    cnst = cnst if cnst is not None else CNST
+    added = 0
+    for a, b in candidates:
+        ta = towns[a]
+        tb = towns[b]
+        if not checkMaxLength(ta, tb, cnst):
+            continue
+        
+        with profiler.timer('clearance'):
+            blocked = clearance.segmentBlocked(a, b, cnst['NB_ZONE_ROAD'])
+        if blocked:
+            continue
+        
+        with profiler.timer('crossings'):
+            crossing = crossings.crosses(a, b)
+        if crossing:
+            continue
+
+        ta.appendRoad(tb)
+        added += 1
+    return added
+
+def checkMaxLength(town1: Town, town2: Town, cnst: dict = None) -> bool:
+    '''
+    Checks if the distance between two towns is within the maximum road length.
+    
+    :param town1: First town
+    :param town2: Second town
+    :param cnst: Constants dictionary, defaults to constants.json
+    :return: True if within limit, False otherwise
+    '''
+    cnst = cnst if cnst is not None else CNST
+    distance = math.hypot(town1.x - town2.x, town1.y - town2.y)
+    if distance <= cnst['MAX_ROAD_LENGTH']:
         return True
     else:
         return False
 
+def repairConnectivity(towns: TownTable, candidates: set, connectivity: Connectivity, crossings: SegmentGrid, clearance: PointGrid, cnst: dict = None) -> bool:
+    '''
+    Reconnects the components of the road network instead of regenerating the map.
+    Candidate roads are tried from shortest to longest and kept if they join two components
+    and are valid roads (Kruskal over the candidates). With Delaunay edges as candidates this
+    adds the missing edges of the Euclidean minimum spanning tree.
+    
+    :param towns: Table of towns
+    :param candidates: Set of (town ID, town ID) candidate roads
+    :param connectivity: Connectivity tracker attached to the road network
+    :param crossings: Segment grid attached to the road network
+    :param clearance: Point grid of the towns
+    :param cnst: Constants dictionary, defaults to constants.json
+    :return: True if the network is connected afterwards, False otherwise
+    '''
+    cnst = cnst if cnst is not None else CNST
+    pairs = np.array(sorted(candidates), dtype=np.int64).reshape(-1, 2)
+    x = towns.x.astype(np.float64)
+    y = towns.y.astype(np.float64)
+    lengths = np.hypot(x[pairs[:, 0]] - x[pairs[:, 1]], y[pairs[:, 0]] - y[pairs[:, 1]])
+    order = np.argsort(lengths, kind='stable')
+
+    for (a, b), length in zip(pairs[order].tolist(), lengths[order].tolist()):
+        if connectivity.isConnected():
+            break
+        if length > cnst['MAX_ROAD_LENGTH'] or connectivity.connected(a, b):
+            continue
+        with profiler.timer('clearance'):
+            blocked = clearance.segmentBlocked(a, b, cnst['NB_ZONE_ROAD'])
+        if blocked:
+            continue
+        with profiler.timer('crossings'):
+            crossing = crossings.crosses(a, b)
+        if crossing:
+            continue
+        towns.roads.add(a, b)
+
+    return connectivity.isConnected()
+
@@ -0,0 +1,45 @@
+'''
+Config module
+
+Loads the simulation constants once. CNST is the one dictionary shared by every module;
+use() swaps another constants file into it in place, so modules that imported it see the
+new values.
+'''
+import copy
+import json
+import os
+
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'constants.json')
+
+_files = {}
+
+
+def load(path: str = CONFIG_FILE) -> dict:
+    '''
+    Reads a constants file, each file only once.
+
+    :param path: Path of a JSON constants file
+    :return: Dictionary of constants (a new copy on every call)
+    '''
+    path = os.path.abspath(path)
+    if path not in _files:
+        with open(path, 'r') as f:
+            _files[path] = json.load(f)
+    return copy.deepcopy(_files[path])
+
+
+def use(path: str) -> dict:
+    '''
+    Replaces the shared constants with those of another file. Constants missing from the
+    file keep their values from constants.json.
+
+    :param path: Path of a JSON constants file
+    :return: The shared CNST dictionary
+    '''
+    CNST.clear()
+    CNST.update(load(CONFIG_FILE))
+    CNST.update(load(path))
+    return CNST
+
+
+CNST = load()
@@ -0,0 +1,190 @@
+'''
+Delaunay module
+'''
+import numpy as np
+
+
+def hilbertOrder(xs: list, ys: list, order: int = 16) -> np.ndarray:
+    '''
+    Returns the permutation that sorts points along a Hilbert curve.
+
+    :param xs: X coordinates
+    :param ys: Y coordinates
+    :param order: Number of bits per axis of the curve grid
+    :return: Array of point indices in curve order
+    '''
+    x = np.asarray(xs, dtype=np.float64)
+    y = np.asarray(ys, dtype=np.float64)
+    if len(x) == 0:
+        return np.zeros(0, dtype=np.int64)
+    side = 1 << order
+    span = max(np.ptp(x), np.ptp(y)) or 1.0
+    hx = ((x - x.min()) / span * (side - 1)).astype(np.int64)
+    hy = ((y - y.min()) / span * (side - 1)).astype(np.int64)
+    d = np.zeros(len(x), dtype=np.int64)
+    s = side >> 1
+    while s > 0:
+        rx = (hx & s) > 0
+        ry = (hy & s) > 0
+        d += s * s * ((3 * rx) ^ ry)
+        # Rotate the quadrant so the curve stays continuous
+        flip = ~ry & rx
+        hx = np.where(flip, side - 1 - hx, hx)
+        hy = np.where(flip, side - 1 - hy, hy)
+        hx, hy = np.where(ry, hx, hy), np.where(ry, hy, hx)
+        s >>= 1
+    return np.argsort(d, kind='stable')
+
+
+def triangulate(xs: list, ys: list) -> list:
+    '''
+    Incremental Bowyer-Watson Delaunay triangulation in expected O(n log n).
+
+    Triangles keep their circumcircle and their three neighbours, points are inserted in
+    Hilbert order and located by walking from the last created triangle, and the cavity of
+    each new point is found by a flood fill over neighbours instead of a scan of all triangles.
+
+    :param xs: X coordinates
+    :param ys: Y coordinates
+    :return: List of (a, b, c) point index triples, counter-clockwise
+    '''
+    n = len(xs)
+    if n < 3:
+        return []
+
+    px = [float(v) for v in xs]
+    py = [float(v) for v in ys]
+    minx, maxx = min(px), max(px)
+    miny, maxy = min(py), max(py)
+    delta = max(maxx - minx, maxy - miny) * 10.0 + 1.0
+    cx = (minx + maxx) / 2.0
+    cy = (miny + maxy) / 2.0
+    px += [cx - 2 * delta, cx + 2 * delta, cx]
+    py += [cy - delta, cy - delta, cy + 2 * delta]
+
+    # Flat per-triangle storage: vertices, neighbour opposite each vertex, circumcircle
+    V = []
+    N = []
+    CX = []
+    CY = []
+    R2 = []
+    alive = []
+    free = []
+
+    def allocate(a: int, b: int, c: int) -> int:
+        x1, y1, x2, y2, x3, y3 = px[a], py[a], px[b], py[b], px[c], py[c]
+        d = 2 * (x1 * (y2 - y3) + x2 * (y3 - y1) + x3 * (y1 - y2))
+        if abs(d) < 1e-12:
+            ux, uy, r2 = 0.0, 0.0, -1.0
+        else:
+            s1, s2, s3 = x1 * x1 + y1 * y1, x2 * x2 + y2 * y2, x3 * x3 + y3 * y3
+            ux = (s1 * (y2 - y3) + s2 * (y3 - y1) + s3 * (y1 - y2)) / d
+            uy = (s1 * (x3 - x2) + s2 * (x1 - x3) + s3 * (x2 - x1)) / d
+            r2 = (ux - x1) ** 2 + (uy - y1) ** 2
+        if free:
+            t = free.pop()
+            V[3 * t:3 * t + 3] = (a, b, c)
+            N[3 * t:3 * t + 3] = (-1, -1, -1)
+            CX[t], CY[t], R2[t] = ux, uy, r2
+            alive[t] = True
+        else:
+            t = len(alive)
+            V.extend((a, b, c))
+            N.extend((-1, -1, -1))
+            CX.append(ux)
+            CY.append(uy)
+            R2.append(r2)
+            alive.append(True)
+        return t
+
+    def locate(x: float, y: float, t: int) -> int:
+        for step in range(4 * n + 16):
+            base = 3 * t
+            for j in range(3):
+                k = (j + step) % 3
+                a = V[base + (k + 1) % 3]
+                b = V[base + (k + 2) % 3]
+                if (px[b] - px[a]) * (y - py[a]) - (py[b] - py[a]) * (x - px[a]) < 0:
+                    t = N[base + k]
+                    break
+            else:
+                return t
+        # Walk did not converge (degenerate input), fall back to a linear scan
+        for t in range(len(alive)):
+            if alive[t] and all(
+                (px[V[3 * t + (k + 2) % 3]] - px[V[3 * t + (k + 1) % 3]]) * (y - py[V[3 * t + (k + 1) % 3]])
+                - (py[V[3 * t + (k + 2) % 3]] - py[V[3 * t + (k + 1) % 3]]) * (x - px[V[3 * t + (k + 1) % 3]]) >= 0
+                for k in range(3)
+            ):
+                return t
+        return -1
+
+    last = allocate(n, n + 1, n + 2)
+
+    for i in hilbertOrder(xs, ys).tolist():
+        x, y = px[i], py[i]
+        start = locate(x, y, last)
+        if start < 0:
+            continue
+        if any(px[v] == x and py[v] == y for v in V[3 * start:3 * start + 3]):
+            continue  # duplicate point
+
+        bad = {start}
+        stack = [start]
+        boundary = []
+        while stack:
+            t = stack.pop()
+            for k in range(3):
+                nb = N[3 * t + k]
+                if nb in bad:
+                    continue
+                if nb != -1 and (x - CX[nb]) ** 2 + (y - CY[nb]) ** 2 <= R2[nb] + 1e-8:
+                    bad.add(nb)
+                    stack.append(nb)
+                else:
+                    boundary.append((V[3 * t + (k + 1) % 3], V[3 * t + (k + 2) % 3], nb))
+
+        for t in bad:
+            alive[t] = False
+            free.append(t)
+
+        starts = {}
+        ends = {}
+        created = []
+        for a, b, outer in boundary:
+            t = allocate(a, b, i)
+            N[3 * t + 2] = outer
+            if outer != -1:
+                for k in range(3):
+                    if V[3 * outer + (k + 1) % 3] == b and V[3 * outer + (k + 2) % 3] == a:
+                        N[3 * outer + k] = t
+                        break
+            starts[a] = t
+            ends[b] = t
+            created.append(t)
+        for t in created:
+            N[3 * t] = starts[V[3 * t + 1]]
+            N[3 * t + 1] = ends[V[3 * t]]
+        last = created[-1]
+
+    return [
+        (V[3 * t], V[3 * t + 1], V[3 * t + 2])
+        for t in range(len(alive))
+        if alive[t] and V[3 * t] < n and V[3 * t + 1] < n and V[3 * t + 2] < n
+    ]
+
+
+def delaunayEdges(xs: list, ys: list) -> set:
+    '''
+    Return set of edges (index pairs) of the Delaunay triangulation of the points.
+
+    :param xs: X coordinates
+    :param ys: Y coordinates
+    :return: Set of sorted edge tuples
+    '''
+    edges = set()
+    for a, b, c in triangulate(xs, ys):
+        edges.add((a, b) if a < b else (b, a))
+        edges.add((b, c) if b < c else (c, b))
+        edges.add((c, a) if c < a else (a, c))
+    return edges
@@ -1,10 +1,14 @@
 '''
 Draws module
 '''
+import numpy as np
 import pygame
 import pygame.gfxdraw
 
-from builder import Town
+import profiler
+from hud import Hud
+from town import Town, TownTable
+from viewport import DENSITY_FILL, LOD_TOWNS, Camera, MapIndex
 
 
 def createWindow(width: int, height: int) -> pygame.Surface:
@@ -26,106 +30,203 @@ def createWindow(width: int, height: int) -> pygame.Surface:
     Screen.fill((255, 255, 255))  
     return Screen, Clock
 
-def drawTowns(Screen: pygame.Surface, towns: list) -> None:
+def project(towns: TownTable, camera: Camera = None, ids: np.ndarray = None) -> tuple:
     '''
-    Draws every town from the list
+    Screen positions of towns.
     
-    :param Screen: Surface to draw onto
-    :type Screen: pygame.Surface
-    :param towns: List of towns
-    :type towns: list
-    :return: None 
+    :param towns: Table of towns
+    :param camera: Camera to project with, None draws the map at 1:1 from the origin
+    :param ids: Town IDs to project, None for every town
+    :return: Tuple (screen X list, screen Y list)
     '''
+    xs = towns.x if ids is None else towns.x[ids]
+    ys = towns.y if ids is None else towns.y[ids]
+    if camera is not None:
+        xs, ys = camera.worldToScreen(xs, ys)
+    return xs.tolist(), ys.tolist()
 
-    alive_towns = [town for town in towns if (town.isAlive and not town.isMain)]
-    dead_towns = [town for town in towns if (not town.isAlive and not town.isMain)]
-    main_hub = [town for town in towns if town.isMain]
+MIN_INTENSITY = 100
+MAX_INTENSITY = 255
+ARCHETYPE_CHANNEL = {'Collector': 0, 'Basic': 1, 'Laissez-Faire': 2}  # red, green, blue
 
-    populations = [town.population for town in alive_towns]
-    min_p = min(populations)
-    max_p = max(populations)
-    pop_range = max_p - min_p
+_sprites = None
 
-    minimum_green = 100
-    maximum_green = 255
-    minimum_red = 100
-    maximum_red = 255
-    minimum_blue = 100
-    maximum_blue = 255
-    
-    for town in alive_towns:
-        if pop_range == 0:
-            ratio = 1.0
-        else:
-            ratio = (town.population - min_p) / pop_range
-        
-        if town.AgentType == 'Basic':
-            current_intensity = int(minimum_green + (maximum_green - minimum_green) * ratio)
-            color = (0, current_intensity, 0)
-        elif town.AgentType == 'Collector':
-            current_intensity = int(minimum_red + (maximum_red - minimum_red) * ratio)
-            color = (current_intensity, 0, 0)
-        elif town.AgentType == 'Laissez-Faire':
-            current_intensity = int(minimum_blue + (maximum_blue - minimum_blue) * ratio)
-            color = (0, 0, current_intensity)
-        else:
-            color = (0, int(minimum_green + (maximum_green - minimum_green) * ratio), 0)  # default to green
-        
-        pygame.draw.circle(Screen, (0,0,0), (town.x, town.y), 10, 5)
-        pygame.draw.circle(Screen, color, (town.x, town.y), 10, 4)
-        pygame.draw.circle(Screen, (0,0,0), (town.x, town.y), 10, 1)
 
-        if town.AgentType == 'Collector':
-            pygame.draw.circle(Screen, (255, 0, 0), (town.x, town.y), 2)
+def townSprites() -> tuple:
+    '''
+    Pre-renders every look a town can have, once per process: one sprite per archetype and
+    colour intensity, plus the dead town ring and the Main town square.
+    
+    :return: Tuple (list of alive town sprites indexed by archetype * levels + level,
+        list of their colours, dead sprite, Main sprite, sprite half size)
+    '''
+    global _sprites
+    if _sprites is not None:
+        return _sprites
 
-        if town.AgentType == 'Laissez-Faire':
-            pygame.draw.circle(Screen, (0, 0, 255), (town.x, town.y), 2)
+    half = 13
+    size = 2 * half
+    key = (255, 0, 255)
+    convert = pygame.display.get_surface() is not None
 
-        if town.AgentType == 'Basic':
-            pygame.draw.circle(Screen, (0, 255, 0), (town.x, town.y), 2)
+    def sprite():
+        surface = pygame.Surface((size, size))
+        surface.fill(key)
+        surface.set_colorkey(key)
+        return surface
 
-    for town in dead_towns:
+    def finish(surface):
+        return surface.convert() if convert else surface
 
-        pygame.draw.circle(Screen, (0,0,0), (town.x, town.y), 12, 1)
+    alive = []
+    colors = []
+    for name in Town.archetypes:
+        channel = ARCHETYPE_CHANNEL[name]
+        for intensity in range(MIN_INTENSITY, MAX_INTENSITY + 1):
+            color = [0, 0, 0]
+            color[channel] = intensity
+            dot = [0, 0, 0]
+            dot[channel] = 255
+            surface = sprite()
+            pygame.draw.circle(surface, (0,0,0), (half, half), 10, 5)
+            pygame.draw.circle(surface, color, (half, half), 10, 4)
+            pygame.draw.circle(surface, (0,0,0), (half, half), 10, 1)
+            pygame.draw.circle(surface, dot, (half, half), 2)
+            alive.append(finish(surface))
+            colors.append(tuple(color))
 
-    for town in main_hub:
-        rect = pygame.Rect(town.x-10, town.y-10, 20, 20)
-        pygame.draw.rect(Screen, (255, 215, 0), rect)
+    dead = sprite()
+    pygame.draw.circle(dead, (0,0,0), (half, half), 12, 1)
+    main = sprite()
+    pygame.draw.rect(main, (255, 215, 0), pygame.Rect(half-10, half-10, 20, 20))
+    _sprites = (alive, colors, finish(dead), finish(main), half)
+    return _sprites
 
-def drawRoads(Screen: pygame.Surface, towns: list) -> None:
+def drawTowns(Screen: pygame.Surface, towns: TownTable, camera: Camera = None, ids: np.ndarray = None) -> None:
     '''
-    Draws roads between connected towns.
+    Draws every town from the list. Colours of all towns are looked up at once from their
+    archetype and population, and the matching pre-rendered sprites are stamped in one
+    Surface.blits batch per layer.
     
     :param Screen: Surface to draw onto
     :type Screen: pygame.Surface
-    :param towns: List of towns
-    :type towns: list
+    :param towns: Table of towns
+    :type towns: TownTable
+    :param camera: Camera to draw through, None draws the map at 1:1 from the origin
+    :type camera: Camera
+    :param ids: IDs of the towns to draw, None for every town
+    :type ids: np.ndarray
+    :return: None 
+    '''
+    if ids is None:
+        ids = np.arange(len(towns))
+    alive_sprites, alive_colors, dead_sprite, main_sprite, half = townSprites()
+
+    alive_mask = towns.isAlive & ~towns.isMain
+    populations = towns.population[alive_mask]
+    min_p = int(populations.min()) if populations.size else 0
+    max_p = int(populations.max()) if populations.size else 0
+    pop_range = max_p - min_p
+
+    xs, ys = towns.x[ids], towns.y[ids]
+    if camera is not None:
+        xs, ys = camera.worldToScreen(xs, ys)
+
+    # Alive towns: sprite index = archetype * levels + intensity level
+    alive = alive_mask[ids]
+    if pop_range == 0:
+        ratio = np.ones(int(alive.sum()))
+    else:
+        ratio = (towns.population[ids[alive]] - min_p) / pop_range
+    levels = MAX_INTENSITY - MIN_INTENSITY + 1
+    level = (MIN_INTENSITY + (MAX_INTENSITY - MIN_INTENSITY) * ratio).astype(np.int64) - MIN_INTENSITY
+    sprite = towns.archetype[ids[alive]].astype(np.int64) * levels + level
+    dead = ~towns.isAlive[ids] & ~towns.isMain[ids]
+    main = towns.isMain[ids]
+
+    if len(ids) > LOD_TOWNS:
+        # Too many towns for sprites to be told apart, write one pixel per town instead
+        w, h = Screen.get_size()
+        palette = np.array([Screen.map_rgb(color) for color in alive_colors + [(0, 0, 0), (255, 215, 0)]], dtype=np.int64)
+        color = np.empty(len(ids), dtype=np.int64)
+        color[alive] = palette[sprite]
+        color[dead] = palette[-2]
+        color[main] = palette[-1]
+        inside = (xs >= 0) & (xs < w) & (ys >= 0) & (ys < h)
+        pixels = pygame.surfarray.pixels2d(Screen)
+        pixels[xs[inside], ys[inside]] = color[inside].astype(pixels.dtype)
+        del pixels
+        return None
+
+    corners = np.stack((xs - half, ys - half), axis=1).tolist()
+    Screen.blits(list(zip([alive_sprites[k] for k in sprite.tolist()], [corners[i] for i in np.flatnonzero(alive).tolist()])), doreturn=False)
+    Screen.blits([(dead_sprite, corners[i]) for i in np.flatnonzero(dead).tolist()], doreturn=False)
+    Screen.blits([(main_sprite, corners[i]) for i in np.flatnonzero(main).tolist()], doreturn=False)
+
+def drawDensity(Screen: pygame.Surface, towns: TownTable, camera: Camera, ids: np.ndarray, tile: int = 8) -> None:
+    '''
+    Draws towns aggregated into square tiles, for views with too many towns to draw one by
+    one. Tiles darken with the population living in them and take the archetype colours
+    (Collector red, Laissez-Faire blue, Basic green) in proportion to their population.
+    
+    :param Screen: Surface to draw onto
+    :param towns: Table of towns
+    :param camera: Camera to draw through
+    :param ids: IDs of the towns on screen
+    :param tile: Tile size in pixels
     :return: None
     '''
-    drawn_edges = set()
+    ids = ids[towns.isAlive[ids]]
+    if not len(ids):
+        return None
+    cols = -(-camera.width // tile)
+    rows = -(-camera.height // tile)
+    sx, sy = camera.worldToScreen(towns.x[ids], towns.y[ids])
+    cell = np.clip(sx // tile, 0, cols - 1) * rows + np.clip(sy // tile, 0, rows - 1)
+    pop = towns.population[ids].astype(np.float64)
 
-    for town in towns:
-        for connected_town in town.roads:
-            edge_id = frozenset((town, connected_town))
-            if edge_id not in drawn_edges:
-                pygame.gfxdraw.line(Screen, town.x, town.y, connected_town.x, connected_town.y, (122, 122, 122))
-                drawn_edges.add(edge_id)
+    # Population per tile and archetype, mixed into one colour per tile
+    channel_of = {'Collector': 0, 'Laissez-Faire': 2, 'Basic': 1}
+    archetype_rgb = np.zeros((len(Town.archetypes), 3))
+    for code, name in enumerate(Town.archetypes):
+        archetype_rgb[code, channel_of[name]] = 255.0
+    mix = np.zeros((cols * rows, 3))
+    for code in range(len(Town.archetypes)):
+        mask = towns.archetype[ids] == code
+        mix += np.bincount(cell[mask], pop[mask], minlength=cols * rows)[:, None] * archetype_rgb[code]
+    total = np.bincount(cell, pop, minlength=cols * rows)
+    occupied = total > 0
+    mix[occupied] /= total[occupied, None]
+    density = np.sqrt(total / total.max())[:, None]
+    rgb = 255.0 * (1.0 - density) + mix * density
 
-def drawTurns(Screen: pygame.Surface, cycles: int) -> None: #draw simulation turns counter
+    surface = pygame.surfarray.make_surface(rgb.reshape(cols, rows, 3).astype(np.uint8))
+    surface = pygame.transform.scale(surface, (cols * tile, rows * tile))
+    surface.set_colorkey((255, 255, 255))
+    Screen.blit(surface, (0, 0))
+
+def drawRoads(Screen: pygame.Surface, towns: TownTable, camera: Camera = None, roads: np.ndarray = None) -> None:
     '''
-    Draws the simulation turns counter on the screen.
+    Draws roads between connected towns.
     
     :param Screen: Surface to draw onto
     :type Screen: pygame.Surface
-    :param cycles: Number of simulation cycles/turns
-    :type cycles: int
+    :param towns: Table of towns
+    :type towns: TownTable
+    :param camera: Camera to draw through, None draws the map at 1:1 from the origin
+    :type camera: Camera
+    :param roads: Indices into RoadNetwork.edges of the roads to draw, None for every road
+    :type roads: np.ndarray
     :return: None
     '''
-    font = pygame.font.SysFont(None, 16)
-    turns_text = font.render(f'Turns: {cycles}', True, (0, 0, 0))
-    Screen.blit(turns_text, (10, 10))
+    edges = towns.roads.edges if roads is None else towns.roads.edges[roads]
+    xa, ya = project(towns, camera, edges[:, 0])
+    xb, yb = project(towns, camera, edges[:, 1])
+
+    for x1, y1, x2, y2 in zip(xa, ya, xb, yb):
+        pygame.gfxdraw.line(Screen, x1, y1, x2, y2, (122, 122, 122))
 
-def drawSelectionBox(Screen: pygame.Surface, selected_town: Town) -> None:
+def drawSelectionBox(Screen: pygame.Surface, selected_town: Town, camera: Camera = None) -> pygame.Rect | None:
     '''
     Draws a selection box around the selected town.
     
@@ -133,7 +234,161 @@ def drawSelectionBox(Screen: pygame.Surface, selected_town: Town) -> None:
     :type Screen: pygame.Surface
     :param selected_town: The currently selected town
     :type selected_town: Town
-    :return: None
+    :param camera: Camera to draw through, None draws the map at 1:1 from the origin
+    :type camera: Camera
+    :return: Area of the screen that was drawn, None if no town is selected
+    :rtype: pygame.Rect | None
     '''
     if selected_town:
-        pygame.draw.circle(Screen, (0, 0, 0), (selected_town.x, selected_town.y), 16, 2)
\ No newline at end of file
+        (x,), (y,) = project(selected_town.table, camera, np.array([selected_town.index]))
+        return pygame.draw.circle(Screen, (0, 0, 0), (x, y), 16, 2)
+    return None
+
+
+class MapRenderer:
+    '''
+    Draws the map through two cached off-screen layers.
+
+    Roads only change with the map, so they are rendered once per map, window size and
+    camera position. Towns only change on week boundaries, so the town layer is rebuilt on
+    top of the roads once per week. Every other frame only the HUD readouts and the
+    selection ring that actually changed are redrawn, and only their rectangles are pushed
+    to the display. Only the towns and roads inside the view are drawn. Views with more
+    than LOD_TOWNS towns are drawn without roads and with one pixel per town, and views
+    denser than DENSITY_FILL towns per pixel as density tiles.
+    '''
+
+    def __init__(self) -> None:
+        '''
+        Initializes an empty renderer, the first frame builds every layer.
+        '''
+        self.roadLayer = None
+        self.mapLayer = None
+        self.index = None
+        self.hud = Hud()
+        self.hud.set('turns', '')
+        self.hud.set('rate', '')  # kept under the counter, set by the caller
+        self._road_key = None
+        self._map_key = None
+        self._index_key = None
+        self._visible = None
+        self._lod = False
+        self._selected = None
+        self._ring = None
+
+    def invalidate(self) -> None:
+        '''
+        Drops the cached layers, the next frame redraws everything.
+
+        :return: None
+        '''
+        self._road_key = None
+        self._map_key = None
+
+    def updateReadouts(self, towns: TownTable, weeks: int, selected_town: Town = None) -> None:
+        '''
+        Refreshes the turn counter, the per-archetype totals and the selected town stats.
+
+        :param towns: Table of towns
+        :param weeks: Current simulation week
+        :param selected_town: The currently selected town
+        :return: None
+        '''
+        hud = self.hud
+        hud.set('turns', f'Turns: {weeks}')
+        alive = towns.isAlive
+        for code, name in enumerate(Town.archetypes):
+            mask = alive & (towns.archetype == code)
+            hud.set(name, f'{name}: {int(mask.sum())} towns, {int(towns.population[mask].sum())} people')
+        if selected_town:
+            food, goods = selected_town.warehouse[:2]
+            hud.set('selected', f'{selected_town!r} ({selected_town.AgentType}): {selected_town.population} people, '
+                                f'food {food:.0f}, goods {goods:.0f}, saldo {selected_town.saldo:.0f}')
+        else:
+            hud.set('selected', '')
+
+    def mapIndex(self, towns: TownTable) -> MapIndex:
+        '''
+        Spatial index of the map, rebuilt when the map or its roads change.
+
+        :param towns: Table of towns
+        :return: MapIndex
+        '''
+        key = (towns.roads, towns.roads.version)
+        if key != self._index_key:
+            self.index = MapIndex(towns)
+            self._index_key = key
+        return self.index
+
+    def pick(self, towns: TownTable, px: int, py: int, camera: Camera = None, radius: float = 16) -> int | None:
+        '''
+        Town under a screen pixel.
+
+        :param towns: Table of towns
+        :param px: Screen X
+        :param py: Screen Y
+        :param camera: Camera the map is drawn through, None for 1:1 from the origin
+        :param radius: Pick radius in pixels
+        :return: Town ID or None
+        '''
+        if camera is None:
+            return self.mapIndex(towns).pick(px, py, radius)
+        x, y = camera.screenToWorld(px, py)
+        return self.mapIndex(towns).pick(x, y, radius / camera.zoom)
+
+    @profiler.timed('render')
+    def render(self, Screen: pygame.Surface, towns: TownTable, weeks: int, selected_town: Town = None, camera: Camera = None) -> list:
+        '''
+        Draws one frame.
+
+        :param Screen: Surface to draw onto
+        :param towns: Table of towns
+        :param weeks: Current simulation week
+        :param selected_town: The currently selected town
+        :param camera: Camera to draw through, None draws the map at 1:1 from the origin
+        :return: List of rectangles to pass to pygame.display.update
+        '''
+        size = Screen.get_size()
+        if camera is None:
+            camera = Camera(*size)
+        road_key = (towns.roads, towns.roads.version, size, camera.key)
+        if road_key != self._road_key:
+            index = self.mapIndex(towns)
+            self._visible = index.townsIn(camera.visible(margin=16))
+            self._lod = len(self._visible) > LOD_TOWNS
+            self.roadLayer = pygame.Surface(size).convert()
+            self.roadLayer.fill((255, 255, 255))
+            if not self._lod:
+                with profiler.timer('render_roads'):
+                    drawRoads(self.roadLayer, towns, camera, index.roadsIn(camera.visible()))
+            self._road_key = road_key
+            self._map_key = None
+
+        selected = selected_town.index if selected_town else None
+        map_key = (road_key, weeks)
+        damaged = []
+        if map_key != self._map_key:
+            self.mapLayer = self.roadLayer.copy()
+            with profiler.timer('render_towns'):
+                if len(self._visible) > DENSITY_FILL * camera.width * camera.height:
+                    drawDensity(self.mapLayer, towns, camera, self._visible)
+                else:
+                    drawTowns(self.mapLayer, towns, camera, self._visible)
+            self._map_key = map_key
+            Screen.blit(self.mapLayer, (0, 0))
+            damaged.append(Screen.get_rect())
+            self._ring = None
+            self.updateReadouts(towns, weeks, selected_town)
+        elif selected != self._selected:
+            if self._ring is not None:
+                damaged.append(Screen.blit(self.mapLayer, self._ring, self._ring))
+                self._ring = None
+            self.updateReadouts(towns, weeks, selected_town)
+        self._selected = selected
+
+        dirty = damaged + self.hud.draw(Screen, self.mapLayer, damaged)
+        if self._ring is None or self._ring.collidelist(dirty) != -1:
+            self._ring = drawSelectionBox(Screen, selected_town, camera)
+            if self._ring is not None:
+                dirty.append(self._ring)
+        return dirty
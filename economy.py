@@ -0,0 +1,80 @@
+'''
+Economy module
+'''
+import numpy as np
+
+from town import Town, TownTable
+
+FOOD, GOODS = 0, 1
+
+COLLECTOR = Town.archetypes.index('Collector')
+LAISSEZ_FAIRE = Town.archetypes.index('Laissez-Faire')
+BASIC = Town.archetypes.index('Basic')
+
+
+def weeklyTick(towns: TownTable, cnst: dict, rng: np.random.Generator = None) -> None:
+    '''
+    Runs one week of the economy for every town at once: production and consumption of the
+    warehouse goods, population growth or starvation, and the per-archetype fee and saldo.
+
+    :param towns: Table of towns
+    :param cnst: Constants dictionary (see constants.json)
+    :param rng: Random generator for rounding the population to whole people; each town is
+        rounded up with the probability of its fractional part, so small towns keep their
+        expected growth. None rounds to the nearest person
+    :return: None
+    '''
+    alive = towns.isAlive
+    pop = towns.population.astype(np.float64)
+    food = towns.warehouse[:, FOOD]
+    goods = towns.warehouse[:, GOODS]
+
+    # Production is limited by farmland, consumption grows with the population
+    food_made = cnst['FOOD_PRODUCTION'] * np.minimum(pop, cnst['FARM_CAPACITY']) * alive
+    goods_made = cnst['GOODS_PRODUCTION'] * pop * alive
+    food_needed = cnst['FOOD_CONSUMPTION'] * pop
+    available = food + food_made
+    fed = np.divide(available, food_needed, out=np.ones_like(pop), where=food_needed > 0).clip(0.0, 1.0)
+    food_surplus = food_made - food_needed
+
+    food[:] = np.maximum(available - food_needed, 0.0)
+    goods[:] = np.maximum(goods + goods_made - cnst['GOODS_CONSUMPTION'] * pop, 0.0)
+
+    # Fed towns grow, the unfed part of a starving town dies off
+    pop = np.where(fed >= 1.0, pop * (1.0 + cnst['GROWTH_RATE']), pop - pop * (1.0 - fed) * cnst['STARVATION_RATE'])
+    dying = alive & (pop < cnst['MIN_POPULATION'])
+    pop[dying | ~alive] = 0.0
+    if rng is None:
+        pop = np.rint(pop)
+    else:
+        pop = np.floor(pop + rng.random(len(pop)))
+    towns.population[:] = pop.astype(np.int64)
+    alive &= ~dying
+
+    # Per-archetype fee and saldo, each rule is one expression over its archetype's mask
+    arch = towns.archetype
+    rates = np.array([cnst['FEE_RATES'][name] for name in Town.archetypes])[arch]
+    value = np.maximum(food_surplus, 0.0) * cnst['FOOD_PRICE'] + goods_made * cnst['GOODS_PRICE']
+    mean_pop = pop[alive].mean() if alive.any() else 1.0
+    collector = alive & (arch == COLLECTOR)
+    laissez_faire = alive & (arch == LAISSEZ_FAIRE)
+    basic = alive & (arch == BASIC)
+
+    towns.fee[:] = np.select(
+        [collector, laissez_faire, basic],
+        [
+            rates * pop / mean_pop,  # Collector: bigger towns charge more
+            0.0,                     # Laissez-Faire: free passage
+            rates,                   # Basic: flat rate
+        ],
+        0.0,
+    )
+    towns.saldo += np.select(
+        [collector, laissez_faire, basic],
+        [
+            towns.fee * value,                                # Collector: taxes everything produced
+            goods_made * cnst['GOODS_PRICE'],                 # Laissez-Faire: keeps its goods trade
+            towns.fee * np.maximum(food_surplus, 0.0) * cnst['FOOD_PRICE'],  # Basic: taxes food surplus
+        ],
+        0.0,
+    )
@@ -0,0 +1,146 @@
+'''
+HUD module
+'''
+from collections import OrderedDict
+
+import pygame
+
+_fonts = {}
+
+
+def getFont(size: int, name: str = None) -> pygame.font.Font:
+    '''
+    Loads a system font once and returns the same object on every later call.
+
+    :param size: Font size
+    :param name: System font name, None for the pygame default font
+    :return: pygame Font
+    '''
+    key = (name, size)
+    font = _fonts.get(key)
+    if font is None:
+        font = _fonts[key] = pygame.font.SysFont(name, size)
+    return font
+
+
+class TextCache:
+    '''
+    Rendered text surfaces keyed by string and colour, with least-recently-used eviction.
+    '''
+
+    def __init__(self, font: pygame.font.Font, capacity: int = 256) -> None:
+        '''
+        Initializes an empty cache.
+
+        :param font: Font to render with
+        :param capacity: Maximum number of cached surfaces
+        '''
+        self.font = font
+        self.capacity = capacity
+        self._surfaces = OrderedDict()
+
+    def render(self, text: str, color: tuple = (0, 0, 0)) -> pygame.Surface:
+        '''
+        Returns the rendered text, rendering it only on a cache miss.
+
+        :param text: Text to render
+        :param color: Text colour
+        :return: pygame Surface with the text
+        '''
+        key = (text, color)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            return surface
+        surface = self.font.render(text, True, color)
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.capacity:
+            self._surfaces.popitem(last=False)
+        return surface
+
+
+class Readout:
+    '''
+    One line of the HUD: the text to show and what is currently on the screen.
+    '''
+    __slots__ = ('text', 'drawn', 'rect')
+
+    def __init__(self) -> None:
+        self.text = ''
+        self.drawn = None
+        self.rect = None
+
+
+class Hud:
+    '''
+    Lines of text drawn over the map. Each readout keeps its line in the order it was first
+    set and is redrawn only when its text changes or the map under it was redrawn.
+    '''
+
+    def __init__(self, size: int = 16, origin: tuple = (10, 10), color: tuple = (0, 0, 0), capacity: int = 256) -> None:
+        '''
+        Initializes an empty HUD.
+
+        :param size: Font size
+        :param origin: Top-left corner of the first line
+        :param color: Text colour
+        :param capacity: Number of rendered texts kept in the cache
+        '''
+        self.text = TextCache(getFont(size), capacity)
+        self.origin = origin
+        self.color = color
+        self.lineHeight = self.text.font.get_linesize()
+        self.readouts = {}
+
+    def set(self, name: str, text: str) -> None:
+        '''
+        Sets the text of a readout, an empty text hides it.
+
+        :param name: Readout name
+        :param text: Text to show
+        :return: None
+        '''
+        readout = self.readouts.get(name)
+        if readout is None:
+            readout = self.readouts[name] = Readout()
+        readout.text = text
+
+    def setLines(self, prefix: str, lines: list) -> None:
+        '''
+        Sets a block of numbered readouts, prefix0, prefix1, ..., hiding the ones left over
+        from a longer block.
+
+        :param prefix: Readout name prefix
+        :param lines: Texts to show
+        :return: None
+        '''
+        for i, text in enumerate(lines):
+            self.set(f'{prefix}{i}', text)
+        i = len(lines)
+        while f'{prefix}{i}' in self.readouts:
+            self.set(f'{prefix}{i}', '')
+            i += 1
+
+    def draw(self, Screen: pygame.Surface, background: pygame.Surface, damaged: list = ()) -> list:
+        '''
+        Redraws the readouts whose text changed or whose line overlaps a damaged area.
+
+        :param Screen: Surface to draw onto
+        :param background: Surface to restore from under an old text
+        :param damaged: Rectangles of the screen that were redrawn since the last call
+        :return: List of rectangles that changed on the screen
+        '''
+        dirty = []
+        x, y = self.origin
+        for line, readout in enumerate(self.readouts.values()):
+            if readout.text == readout.drawn and (readout.rect is None or readout.rect.collidelist(damaged) == -1):
+                continue
+            if readout.rect is not None:
+                Screen.blit(background, readout.rect, readout.rect)
+                dirty.append(readout.rect)
+            readout.rect = None
+            if readout.text:
+                readout.rect = Screen.blit(self.text.render(readout.text, self.color), (x, y + line * self.lineHeight))
+                dirty.append(readout.rect)
+            readout.drawn = readout.text
+        return dirty
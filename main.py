@@ -1,22 +1,50 @@
+import time
 from os import environ
-from tracemalloc import start
 
 environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'
-import json
+import argparse
+import logging
+import random
+import sys
 
-import pygame
+import config
+import mapcache
+import profiler
+from config import CNST
+from recorder import Recording, nextRecordingPath
+from simulation import Simulation, SimulationWorker
 
-import builder
-import draws
-
-towns = []
+worker = None
 Screen, Clock = None, None
-selected_town = None
-cycles, weeks = 0, 0
+renderer = None
+camera = None
 
+parser = argparse.ArgumentParser(description='Torgash logistics simulation.')
+parser.add_argument('--record', metavar='DIR', help='record every simulated week, each run (and restart) into the next numbered sub-directory of DIR')
+parser.add_argument('--replay', metavar='DIR', help='play back a recording instead of simulating')
+parser.add_argument('--profile', action='store_true', help='time the hot paths and show the timings over the map (P toggles)')
+parser.add_argument('--log-level', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'])
+parser.add_argument('--config', metavar='FILE', help='constants file overriding constants.json')
+parser.add_argument('--towns', type=int, help='number of towns')
+parser.add_argument('--size', type=int, nargs=2, metavar=('WIDTH', 'HEIGHT'), help='map size')
+parser.add_argument('--seed', type=int, help='map and simulation seed, a new random one on every restart by default; seeded maps are kept in the map cache')
+parser.add_argument('--generation-type', type=int, default=4, choices=[1, 2, 3, 4], help='1 random, 2 hubs, 3 one line, 4 Delaunay')
+parser.add_argument('--placement', default='rejection', choices=['rejection', 'poisson'], help='town placement, poisson fits large maps')
+parser.add_argument('--headless', action='store_true', help='simulate without a window and print a summary')
+parser.add_argument('--weeks', type=int, default=100, help='weeks to simulate in headless mode')
+args = parser.parse_args()
+if args.headless and args.replay:
+    parser.error('--replay needs the viewer, it cannot be combined with --headless')
+logging.basicConfig(level=args.log_level, format='%(levelname)s %(name)s: %(message)s')
+profiler.enable(args.profile)
 
-with open('constants.json', 'r') as f:
-    CNST = json.load(f)
+if args.config:
+    config.use(args.config)
+if args.towns is not None:
+    CNST['TOWN_NUM'] = args.towns
+if args.size is not None:
+    CNST['WIDTH'], CNST['HEIGHT'] = args.size
+seed = args.seed
 
 
 def askStartValues() -> bool:
@@ -45,41 +73,186 @@ def askStartValues() -> bool:
             print("Invalid input. Using default settings.")
         return False
 
+def NewSimulation() -> Simulation | None:
+    '''
+    Generates the map of a new simulation and starts its recording if one was requested.
+    Without --seed every call draws a new seed, so every restart gets a new map.
+    Runs on the simulation thread.
+    
+    :return: Simulation object or None if map generation fails
+    '''
+    global seed
+
+    if args.seed is None:
+        seed = random.randrange(2 ** 32)
+    cache_dir = mapcache.CACHE_DIR if args.seed is not None else None  # drawn seeds are not asked for again, so their maps are not cached
+    logging.info("Seed %d", seed)
+    sim = Simulation.generate(CNST, generation_type=args.generation_type, placement=args.placement, seed=seed, cache_dir=cache_dir)
+    if sim is not None and args.record:
+        path = nextRecordingPath(args.record)
+        sim.startRecording(path)
+        logging.info("Recording to %s", path)
+    return sim
+
 def StartNewSimulation() -> None:
     '''
-    Initializes a new simulation (light-reset)
+    Initializes a new simulation (light-reset). The map is generated and simulated on the
+    simulation thread, the first call starts that thread.
     
     :return: None
     '''
-    global towns, Screen, Clock, selected_town, cycles, weeks
+    global worker
 
-    towns = builder.initializeMap(CNST['TOWN_NUM'], CNST['START_POPULATION'], CNST['START_WAREHOUSE'], CNST['POP_CF'], CNST['WIDTH'], CNST['HEIGHT'], generation_type=4)
-    if towns is None:
-        print("Error: Could not generate a fully-connected map after multiple attempts.")
+    if worker is None:
+        worker = SimulationWorker(NewSimulation, speed=60.0)
+        worker.start()
+    else:
+        worker.send('restart')
+
+def RunHeadless() -> None:
+    '''
+    Simulates for args.weeks weeks on this thread without opening a window and prints a
+    summary of the final state.
+    
+    :return: None
+    '''
+    start = time.perf_counter()
+    sim = NewSimulation()
+    if sim is None:
+        print("Error: map generation failed.")
         exit(1)
+    sim.run_until(args.weeks)
+    if sim.recorder is not None:
+        sim.recorder.close()
+    towns = sim.towns
+    print(f"Seed {seed}: {sim.weeks} weeks of {len(towns)} towns in {time.perf_counter() - start:.2f} s, "
+          f"{int(towns.isAlive.sum())} towns alive, {int(towns.population.sum())} people")
+    if profiler.isEnabled():
+        print('\n'.join(profiler.report()))
+
+if args.headless:
+    RunHeadless()
+    exit(0)
+
+import pygame  # only the viewer needs pygame
+
+import draws
+from viewport import Camera
+
+def handleViewEvent(event: pygame.event.Event) -> bool:
+    '''
+    Moves the camera and follows window resizes: the wheel zooms around the cursor, right or
+    middle drag and the arrow keys pan, F fits the whole map.
+    
+    :param event: pygame event
+    :return: True if the event was used
+    '''
+    global Screen
+
+    if event.type == pygame.MOUSEWHEEL:
+        camera.zoomAt(1.25 ** event.y, *pygame.mouse.get_pos())
+    elif event.type == pygame.MOUSEMOTION and (event.buttons[1] or event.buttons[2]):
+        camera.pan(-event.rel[0], -event.rel[1])
+    elif event.type == pygame.KEYDOWN and event.key in PAN_KEYS:
+        camera.pan(*PAN_KEYS[event.key])
+    elif event.type == pygame.KEYDOWN and event.key == pygame.K_f:
+        camera.fit(*map_size)
+    elif event.type == pygame.VIDEORESIZE:
+        Screen = pygame.display.set_mode((event.w, event.h), pygame.RESIZABLE)
+        camera.resize(event.w, event.h)
+    else:
+        return False
+    return True
+
+def Replay(recording: Recording) -> None:
+    '''
+    Plays back a recording without simulating. Space plays and pauses, comma and period step
+    one week, Home and End jump to the ends, +/- change the playback speed.
+    
+    :param recording: Recording to play
+    :return: None
+    '''
+    frame, position, playing, weeks_per_second = 0, 0.0, True, 10.0
+    selected = None
+    last = time.perf_counter()
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                return None
+            if handleViewEvent(event):
+                continue
+            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                selected = renderer.pick(recording.towns, *event.pos, camera)
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    playing = not playing
+                elif event.key == pygame.K_COMMA:
+                    position, playing = position - 1, False
+                elif event.key == pygame.K_PERIOD:
+                    position, playing = position + 1, False
+                elif event.key == pygame.K_HOME:
+                    position = 0.0
+                elif event.key == pygame.K_END:
+                    position = len(recording) - 1
+                elif event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                    weeks_per_second *= 2
+                elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                    weeks_per_second = max(weeks_per_second / 2, 0.5)
+
+        now = time.perf_counter()
+        if playing:
+            position += (now - last) * weeks_per_second
+        last = now
+        position = min(max(position, 0.0), len(recording) - 1)
+        frame = int(position)
+        towns = recording.seek(frame)
+        renderer.hud.set('rate', f'Replay {frame + 1}/{len(recording)}, {weeks_per_second:g} weeks/s{"" if playing else " (paused)"}')
+        selected_town = towns[selected] if selected is not None else None
+        pygame.display.update(renderer.render(Screen, towns, int(recording.week[frame]), selected_town, camera))
+        Clock.tick(60)
+
+PAN_KEYS = {pygame.K_LEFT: (-100, 0), pygame.K_RIGHT: (100, 0), pygame.K_UP: (0, -100), pygame.K_DOWN: (0, 100)}
+
+if args.replay:
     Screen, Clock = draws.createWindow(CNST['WIDTH'], CNST['HEIGHT'])
-    cycles = 0
-    weeks = 0
-    selected_town = None
+    renderer = draws.MapRenderer()
+    camera = Camera(*Screen.get_size())
+    recording = Recording(args.replay)
+    if not len(recording):
+        print(f"Error: {args.replay} holds no recorded weeks.")
+        exit(1)
+    map_size = (int(recording.towns.x.max() + recording.towns.x.min()), int(recording.towns.y.max() + recording.towns.y.min()))
+    camera.fit(*map_size)
+    Replay(recording)
+    exit(0)
 
-askStartValues()
+if len(sys.argv) == 1:  # the prompt is only for plain interactive launches
+    askStartValues()
+map_size = (CNST['WIDTH'], CNST['HEIGHT'])
+Screen, Clock = draws.createWindow(CNST['WIDTH'], CNST['HEIGHT'])
+renderer = draws.MapRenderer()
+camera = Camera(*Screen.get_size())
+camera.fit(*map_size)
 StartNewSimulation()
 
 running = True
+speed = 60.0  # cycles per second; the simulation thread is not bound to the frame rate
+paused = False
+rate_start, rate_weeks = time.perf_counter(), 0
 ### Start of main loop ###  
 while running:
-    
-    Screen.fill((255, 255, 255))  
-    draws.drawRoads(Screen, towns)
-    draws.drawTowns(Screen, towns)
-    draws.drawTurns(Screen, weeks)
-    draws.drawSelectionBox(Screen, selected_town)
+    if worker.error:
+        print(f"Error: {worker.error}")
+        exit(1)
+    snapshot = worker.snapshot  # the latest state, older ones are never drawn
+
     for event in pygame.event.get():
-        if event.type == pygame.MOUSEBUTTONDOWN: ## handle selection box
-            mouse_x, mouse_y = pygame.mouse.get_pos()
-            for town in towns:
-                if ((mouse_x - town.x) ** 2 + (mouse_y - town.y) ** 2) <= 16 ** 2:
-                    selected_town = town
+        if handleViewEvent(event):
+            continue
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and snapshot is not None: ## handle selection box
+            picked = renderer.pick(snapshot.towns, *event.pos, camera)
+            if picked is not None:
+                worker.send('select', picked)
             
         if event.type == pygame.QUIT:
             running = False
@@ -88,14 +261,34 @@ while running:
                 running = False
             if event.key == pygame.K_r: ##if key R pressed, restart simulation
                 StartNewSimulation()
-        elif event.type == pygame.VIDEORESIZE:
-            Screen = pygame.display.set_mode((event.w, event.h), pygame.RESIZABLE)
-            
+            if event.key == pygame.K_c: ## C saves a checkpoint, L goes back to it
+                worker.send('checkpoint')
+            if event.key == pygame.K_l:
+                worker.send('restore')
+            if event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS): ## +/- change speed, space pauses
+                speed *= 2
+            if event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                speed = max(speed / 2, 1.0)
+            if event.key == pygame.K_SPACE:
+                paused = not paused
+            if event.key == pygame.K_p: ## P shows or hides the profiler timings
+                profiler.enable(not profiler.isEnabled())
+                if not profiler.isEnabled():
+                    renderer.hud.setLines('profile', [])
+            if event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS, pygame.K_MINUS, pygame.K_KP_MINUS, pygame.K_SPACE):
+                worker.send('speed', 0.0 if paused else speed)
 
-    pygame.display.flip()
+    if snapshot is not None:
+        pygame.display.update(renderer.render(Screen, snapshot.towns, snapshot.weeks, snapshot.selectedTown, camera))
     Clock.tick(60)
-    cycles += 1
 
-    if cycles%50 == 0:
-        weeks += 1
-### End of main loop ###
\ No newline at end of file
+    now = time.perf_counter()
+    if now - rate_start >= 1.0 and snapshot is not None:
+        renderer.hud.set('rate', f'{max(snapshot.weeks - rate_weeks, 0) / (now - rate_start):.1f} weeks/s, {Clock.get_fps():.0f} fps'
+                                 f'{" (paused)" if paused else ""}')
+        rate_start, rate_weeks = now, snapshot.weeks
+        if profiler.isEnabled():
+            renderer.hud.setLines('profile', profiler.report())
+### End of main loop ###
+worker.send('stop')  # lets the worker close the recording
+worker.join(5.0)
\ No newline at end of file
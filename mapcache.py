@@ -0,0 +1,170 @@
+'''
+Map cache module
+'''
+import hashlib
+import json
+import os
+
+import numpy as np
+
+import builder
+from routing import DistanceMatrix, allPairs
+from town import TownTable
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.map_cache')
+FORMAT_VERSION = 1
+DISTANCE_LIMIT = 1000  # largest map whose all-pairs distance matrices are cached with it
+
+# Constants that influence map generation; the economy constants do not invalidate maps
+GENERATION_KEYS = ['START_POPULATION', 'START_WAREHOUSE', 'POP_CF', 'ARCHETYPE_P', 'NB_ZONE_TOWN', 'NB_ZONE_ROAD', 'MAX_ROAD_LENGTH', 'NB_ZONE_BORDER']
+
+
+def mapKey(seed: int, num_towns: int, width: int, height: int, cnst: dict, generation_type: int, placement: str, triangulation: str) -> str:
+    '''
+    Content address of a generated map.
+
+    :param seed: Seed of the map
+    :param num_towns: Number of towns
+    :param width: Map width
+    :param height: Map height
+    :param cnst: Constants dictionary
+    :param generation_type: Type of road generation
+    :param placement: Town placement mode
+    :param triangulation: Delaunay triangulator
+    :return: Hex digest identifying the map
+    '''
+    description = {
+        'format': FORMAT_VERSION,
+        'seed': seed,
+        'towns': num_towns,
+        'size': [width, height],
+        'constants': {key: cnst[key] for key in GENERATION_KEYS},
+        'generation_type': generation_type,
+        'placement': placement,
+        'triangulation': triangulation,
+    }
+    return hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()[:32]
+
+
+def writeAtomically(path: str, write, *args, **kwargs) -> None:
+    '''
+    Writes a file under a temporary name and renames it into place, so concurrent workers
+    never read a partial file.
+
+    :param path: Output file, with the extension the writer would add (.npy, .npz)
+    :param write: Writer called as write(temporary path, *args, **kwargs)
+    :return: None
+    '''
+    root, extension = os.path.splitext(path)
+    tmp = f"{root}.{os.getpid()}.tmp{extension}"
+    write(tmp, *args, **kwargs)
+    os.replace(tmp, path)
+
+
+def saveMap(path: str, towns: TownTable) -> None:
+    '''
+    Saves a map as a compressed .npz archive of its columns and edge list.
+
+    :param path: Output file
+    :param towns: Table of towns
+    :return: None
+    '''
+    writeAtomically(path, np.savez_compressed, **towns.toArrays())
+
+
+def loadMap(path: str) -> TownTable:
+    '''
+    Loads a map saved with saveMap.
+
+    :param path: Map file
+    :return: TownTable
+    '''
+    with np.load(path) as arrays:
+        return TownTable.fromArrays(dict(arrays))
+
+
+def cachedMap(seed: int, cnst: dict, generation_type: int, placement: str = 'rejection', triangulation: str = 'incremental', cache_dir: str = CACHE_DIR) -> TownTable:
+    '''
+    Returns the map for the given seed and settings, from the cache if it was built before.
+
+    :param seed: Seed of the map
+    :param cnst: Constants dictionary
+    :param generation_type: Type of road generation
+    :param placement: Town placement mode
+    :param triangulation: Delaunay triangulator
+    :param cache_dir: Cache directory
+    :return: TownTable or None if map generation fails
+    '''
+    key = mapKey(seed, cnst['TOWN_NUM'], cnst['WIDTH'], cnst['HEIGHT'], cnst, generation_type, placement, triangulation)
+    base = os.path.join(cache_dir, key)
+    path = f"{base}.npz"
+    if os.path.exists(path):
+        towns = loadMap(path)
+    else:
+        towns = builder.initializeMap(cnst['TOWN_NUM'], cnst['START_POPULATION'], cnst['START_WAREHOUSE'], cnst['POP_CF'], cnst['WIDTH'], cnst['HEIGHT'], generation_type, triangulation, placement, seed, cnst)
+        if towns is None:
+            return None
+        os.makedirs(cache_dir, exist_ok=True)
+        saveMap(path, towns)
+    if len(towns) <= DISTANCE_LIMIT:
+        towns.distances = CachedDistances(towns, base)
+    return towns
+
+
+def saveDistances(base: str, matrix: DistanceMatrix) -> None:
+    '''
+    Saves distance matrices next to a map as <base>.dist.npy and <base>.next.npy.
+
+    :param base: Map path without extension
+    :param matrix: DistanceMatrix to save
+    :return: None
+    '''
+    writeAtomically(f"{base}.dist.npy", np.save, matrix.distance.astype(np.float32, copy=False))
+    writeAtomically(f"{base}.next.npy", np.save, matrix.nextHop.astype(np.int32, copy=False))
+
+
+def loadDistances(base: str) -> DistanceMatrix:
+    '''
+    Memory-maps distance matrices saved with saveDistances.
+
+    :param base: Map path without extension
+    :return: DistanceMatrix backed by the files
+    '''
+    return DistanceMatrix(np.load(f"{base}.dist.npy", mmap_mode='r'), np.load(f"{base}.next.npy", mmap_mode='r'))
+
+
+class CachedDistances:
+    '''
+    All-pairs distance matrices of a cached map, made on the first lookup: memory-mapped from
+    <base>.dist.npy/.next.npy, computed and saved first if they are missing. Maps that never
+    look up a route pay nothing.
+    '''
+
+    def __init__(self, towns: TownTable, base: str) -> None:
+        '''
+        Initializes the lazy matrices of a map.
+
+        :param towns: Table of towns
+        :param base: Cache path of the map without extension
+        '''
+        self.towns = towns
+        self.base = base
+        self._matrix = None
+
+    def matrix(self) -> DistanceMatrix:
+        '''
+        Loads the matrices, computing and saving them first if they are missing.
+
+        :return: DistanceMatrix
+        '''
+        if self._matrix is None:
+            if not (os.path.exists(f"{self.base}.dist.npy") and os.path.exists(f"{self.base}.next.npy")):
+                saveDistances(self.base, allPairs(self.towns))
+            self._matrix = loadDistances(self.base)
+        return self._matrix
+
+    def cost(self, a: int, b: int) -> float:
+        return self.matrix().cost(a, b)
+
+    def route(self, a: int, b: int) -> list:
+        return self.matrix().route(a, b)
@@ -0,0 +1,150 @@
+'''
+Profiler module
+
+Per-phase wall-clock timers and event counters for the hot paths. Disabled by default:
+timer() then returns a shared no-op context manager and count() returns immediately, so the
+instrumentation can stay in place. The tables are shared by the simulation and render threads,
+so every update and read holds one lock.
+
+    with profiler.timer('triangulation'):
+        edges = delaunayEdges(xs, ys)
+    profiler.count('retries')
+'''
+import threading
+import time
+from functools import wraps
+
+_enabled = False
+_timers = {}  # name -> [calls, seconds]
+_counters = {}  # name -> count
+_lock = threading.Lock()
+
+
+class _Timer:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __enter__(self) -> '_Timer':
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        elapsed = time.perf_counter() - self.start
+        with _lock:
+            entry = _timers.get(self.name)
+            if entry is None:
+                _timers[self.name] = [1, elapsed]
+            else:
+                entry[0] += 1
+                entry[1] += elapsed
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self) -> '_NullTimer':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+
+_NULL = _NullTimer()
+
+
+def enable(on: bool = True) -> None:
+    '''
+    Turns collection on or off. Collected numbers are kept until reset().
+
+    :param on: True to collect
+    :return: None
+    '''
+    global _enabled
+    _enabled = on
+
+
+def isEnabled() -> bool:
+    return _enabled
+
+
+def reset() -> None:
+    '''
+    Drops every collected timer and counter.
+
+    :return: None
+    '''
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+
+
+def timer(name: str):
+    '''
+    Context manager adding the wall time of its block to a named timer.
+
+    :param name: Timer name
+    :return: Context manager
+    '''
+    return _Timer(name) if _enabled else _NULL
+
+
+def timed(name: str):
+    '''
+    Decorator timing every call of a function under a named timer.
+
+    :param name: Timer name
+    :return: Decorator
+    '''
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with _Timer(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name: str, n: int = 1) -> None:
+    '''
+    Adds to a named counter.
+
+    :param name: Counter name
+    :param n: Amount to add
+    :return: None
+    '''
+    if _enabled:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + n
+
+
+def snapshot() -> dict:
+    '''
+    Copies the collected numbers.
+
+    :return: {'timers': {name: {'calls', 'seconds', 'mean_ms'}}, 'counters': {name: count}}
+    '''
+    with _lock:
+        timers = {name: tuple(entry) for name, entry in _timers.items()}
+        counters = dict(_counters)
+    return {
+        'timers': {name: {'calls': calls, 'seconds': seconds, 'mean_ms': seconds * 1000 / calls}
+                   for name, (calls, seconds) in timers.items()},
+        'counters': counters,
+    }
+
+
+def report() -> list:
+    '''
+    Formats the collected numbers, slowest timer first.
+
+    :return: List of text lines
+    '''
+    data = snapshot()
+    lines = [f"{name}: {t['calls']} x {t['mean_ms']:.2f} ms = {t['seconds']:.2f} s"
+             for name, t in sorted(data['timers'].items(), key=lambda item: -item[1]['seconds'])]
+    lines += [f"{name}: {value}" for name, value in sorted(data['counters'].items())]
+    return lines
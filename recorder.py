@@ -0,0 +1,176 @@
+'''
+Recorder module
+
+A recording is a directory holding a small JSON header, the static map (see mapcache) and
+one raw append-only file per recorded column, one fixed-size row per recorded week:
+
+    header.json  map.npz  week.bin  population.bin  warehouse.bin  ...
+'''
+import json
+import os
+
+import numpy as np
+
+import mapcache
+from town import TownTable
+
+FORMAT_VERSION = 1
+COLUMNS = ['population', 'warehouse', 'isAlive', 'isMain', 'saldo', 'fee']
+
+
+class Recorder:
+    '''
+    Appends the per-week state of a map to a recording. Rows go straight to disk, so RAM use
+    does not grow with the length of the run.
+    '''
+
+    def __init__(self, path: str, towns: TownTable, seed: int = None, columns: list = None, overwrite: bool = False) -> None:
+        '''
+        Starts a new recording.
+
+        :param path: Recording directory
+        :param towns: Table of towns
+        :param seed: Seed of the run, kept in the header
+        :param columns: TownTable columns to record, defaults to COLUMNS
+        :param overwrite: Replace a recording already at path instead of raising FileExistsError
+        '''
+        if not overwrite and os.path.exists(os.path.join(path, 'header.json')):
+            raise FileExistsError(f"{path} already holds a recording")
+        self.path = path
+        self.columns = list(columns or COLUMNS)
+        self.weeks = 0
+        os.makedirs(path, exist_ok=True)
+        mapcache.saveMap(os.path.join(path, 'map.npz'), towns)
+
+        header = {'format': FORMAT_VERSION, 'towns': len(towns), 'seed': seed, 'columns': {'week': ['int64', []]}}
+        self._row_bytes = {'week': 8}
+        for name in self.columns:
+            column = getattr(towns, name)
+            header['columns'][name] = [column.dtype.str, list(column.shape[1:])]
+            self._row_bytes[name] = column.nbytes
+        with open(os.path.join(path, 'header.json'), 'w') as f:
+            json.dump(header, f, indent=4)
+        self._files = {name: open(os.path.join(path, f"{name}.bin"), 'wb') for name in header['columns']}
+
+    def record(self, towns: TownTable, week: int) -> None:
+        '''
+        Appends the current state of the map as one row.
+
+        :param towns: Table of towns
+        :param week: Simulation week of the state
+        :return: None
+        '''
+        self._files['week'].write(np.int64(week).tobytes())
+        for name in self.columns:
+            self._files[name].write(np.ascontiguousarray(getattr(towns, name)).tobytes())
+        self.weeks += 1
+
+    def truncate(self, week: int) -> bool:
+        '''
+        Drops the rows recorded after a week, so a run that went back to that week (see
+        Simulation.restore) continues the recording from there.
+
+        :param week: Last simulation week to keep
+        :return: True if the kept rows end with that week
+        '''
+        self.flush()
+        with open(os.path.join(self.path, 'week.bin'), 'rb') as f:
+            weeks = np.frombuffer(f.read(self.weeks * 8), dtype=np.int64)
+        self.weeks = int(np.searchsorted(weeks, week, side='right'))
+        for name, f in self._files.items():
+            f.truncate(self.weeks * self._row_bytes[name])
+            f.seek(0, os.SEEK_END)
+        return self.weeks > 0 and int(weeks[self.weeks - 1]) == week
+
+    def flush(self) -> None:
+        '''
+        Pushes buffered rows to disk, so a Recording opened now sees them.
+
+        :return: None
+        '''
+        for f in self._files.values():
+            f.flush()
+
+    def close(self) -> None:
+        '''
+        Flushes and closes the column files.
+
+        :return: None
+        '''
+        for f in self._files.values():
+            f.close()
+
+    def __enter__(self) -> 'Recorder':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def nextRecordingPath(root: str) -> str:
+    '''
+    First free numbered sub-directory of root (root/0, root/1, ...), so every run recorded
+    under the same root gets its own recording.
+
+    :param root: Directory holding the recordings
+    :return: Recording directory
+    '''
+    number = 0
+    while os.path.exists(os.path.join(root, str(number))):
+        number += 1
+    return os.path.join(root, str(number))
+
+
+class Recording:
+    '''
+    Read-only view of a recording. Every column is memory-mapped as a (weeks, towns, ...)
+    array, e.g. recording.population[:, town] is one town's population history, and seek()
+    loads one week into a TownTable the renderer can draw.
+    '''
+
+    def __init__(self, path: str) -> None:
+        '''
+        Opens a recording.
+
+        :param path: Recording directory
+        '''
+        self.path = path
+        with open(os.path.join(path, 'header.json')) as f:
+            self.header = json.load(f)
+        if self.header['format'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported recording format {self.header['format']}")
+        self.towns = mapcache.loadMap(os.path.join(path, 'map.npz'))
+        self.seed = self.header['seed']
+
+        n = self.header['towns']
+        self.columns = {}
+        for name, (dtype, shape) in self.header['columns'].items():
+            dtype = np.dtype(dtype)
+            row_shape = (n, *shape) if name != 'week' else ()
+            row_bytes = dtype.itemsize * int(np.prod(row_shape, dtype=np.int64))
+            rows = os.path.getsize(os.path.join(path, f"{name}.bin")) // row_bytes
+            self.columns[name] = (dtype, row_shape, rows)
+        # A run that was cut off may have written part of its last row
+        self.length = min(rows for _, _, rows in self.columns.values())
+        for name, (dtype, row_shape, _) in self.columns.items():
+            if self.length:
+                array = np.memmap(os.path.join(path, f"{name}.bin"), dtype=dtype, mode='r', shape=(self.length, *row_shape))
+            else:
+                array = np.zeros((0, *row_shape), dtype=dtype)
+            setattr(self, name, array)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def seek(self, index: int) -> TownTable:
+        '''
+        Loads one recorded week into the map.
+
+        :param index: Row of the recording, 0 is the first recorded week
+        :return: TownTable of the map at that week (the same table on every call)
+        '''
+        for name in self.columns:
+            if name != 'week':
+                getattr(self.towns, name)[:] = getattr(self, name)[index]
+        self.towns.mainVersion += 1
+        return self.towns
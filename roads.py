@@ -0,0 +1,287 @@
+'''
+Roads module
+'''
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from town import TownTable
+
+
+class RoadNetwork:
+    '''
+    Central registry of the roads of a map, keyed by integer town IDs.
+
+    Roads are edited through per-town adjacency dicts (O(1) add/remove, insertion ordered).
+    The edge array, the precomputed road lengths and the CSR view (offsets + neighbour array)
+    are derived from them lazily and rebuilt only after the roads have changed.
+    Observers (objects with roadAdded(a, b) / roadRemoved(a, b)) are notified of every change.
+    '''
+
+    def __init__(self, towns: TownTable) -> None:
+        '''
+        Initializes an empty road network over a TownTable.
+
+        :param towns: TownTable the town IDs refer to
+        '''
+        self.towns = towns
+        self.adjacency = [{} for _ in range(len(towns))]
+        self.count = 0
+        self.version = 0
+        self.observers = []
+        self._built_version = -1
+        self._edges = np.zeros((0, 2), dtype=np.int32)
+        self._lengths = np.zeros(0, dtype=np.float64)
+        self._offsets = np.zeros(1, dtype=np.int32)
+        self._neighbours = np.zeros(0, dtype=np.int32)
+        self._slot_edges = np.zeros(0, dtype=np.int32)
+
+    def grow(self, size: int) -> None:
+        '''
+        Extends the network to cover towns up to the given table size.
+
+        :param size: New number of towns
+        :return: None
+        '''
+        while len(self.adjacency) < size:
+            self.adjacency.append({})
+        self.version += 1
+
+    def add(self, a: int, b: int) -> bool:
+        '''
+        Adds a road between two towns.
+
+        :param a: First town ID
+        :param b: Second town ID
+        :return: True if the road was added, False if it already existed
+        '''
+        if a == b or b in self.adjacency[a]:
+            return False
+        self.adjacency[a][b] = None
+        self.adjacency[b][a] = None
+        self.count += 1
+        self.version += 1
+        for observer in self.observers:
+            observer.roadAdded(a, b)
+        return True
+
+    def remove(self, a: int, b: int) -> bool:
+        '''
+        Removes the road between two towns.
+
+        :param a: First town ID
+        :param b: Second town ID
+        :return: True if the road was removed, False if there was none
+        '''
+        if b not in self.adjacency[a]:
+            return False
+        del self.adjacency[a][b]
+        del self.adjacency[b][a]
+        self.count -= 1
+        self.version += 1
+        for observer in self.observers:
+            observer.roadRemoved(a, b)
+        return True
+
+    def clear(self, a: int) -> None:
+        '''
+        Removes every road of a town.
+
+        :param a: Town ID
+        :return: None
+        '''
+        for b in list(self.adjacency[a]):
+            self.remove(a, b)
+
+    def has(self, a: int, b: int) -> bool:
+        '''
+        Checks if two towns are connected by a road.
+
+        :param a: First town ID
+        :param b: Second town ID
+        :return: True if connected, False otherwise
+        '''
+        return b in self.adjacency[a]
+
+    def degree(self, a: int) -> int:
+        '''
+        Number of roads of a town.
+
+        :param a: Town ID
+        :return: Number of roads
+        '''
+        return len(self.adjacency[a])
+
+    def neighbours(self, a: int) -> list:
+        '''
+        IDs of the towns connected to a town.
+
+        :param a: Town ID
+        :return: List of town IDs
+        '''
+        return list(self.adjacency[a])
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _build(self) -> None:
+        '''
+        Rebuilds the edge array, road lengths and CSR view if the roads have changed.
+
+        :return: None
+        '''
+        if self._built_version == self.version:
+            return
+        n = len(self.adjacency)
+        edges = [(a, b) for a, others in enumerate(self.adjacency) for b in others if a < b]
+        self._edges = np.array(edges, dtype=np.int32).reshape(-1, 2)
+        x = self.towns.x.astype(np.float64)
+        y = self.towns.y.astype(np.float64)
+        a, b = self._edges[:, 0], self._edges[:, 1]
+        self._lengths = np.hypot(x[a] - x[b], y[a] - y[b])
+
+        # Each road appears once per direction in the CSR arrays
+        sources = np.concatenate((a, b))
+        targets = np.concatenate((b, a))
+        edge_ids = np.tile(np.arange(len(self._edges), dtype=np.int32), 2)
+        order = np.argsort(sources, kind='stable')
+        self._neighbours = targets[order]
+        self._slot_edges = edge_ids[order]
+        self._offsets = np.zeros(n + 1, dtype=np.int32)
+        np.cumsum(np.bincount(sources, minlength=n), out=self._offsets[1:])
+        self._built_version = self.version
+
+    @property
+    def edges(self) -> np.ndarray:
+        '''
+        (E, 2) int32 array of roads, each stored once with the lower town ID first.
+        '''
+        self._build()
+        return self._edges
+
+    @property
+    def lengths(self) -> np.ndarray:
+        '''
+        (E,) float64 array of Euclidean road lengths, aligned with edges.
+        '''
+        self._build()
+        return self._lengths
+
+    def csr(self) -> tuple:
+        '''
+        Compressed sparse row view of the network. Neighbours of town i are
+        neighbours[offsets[i]:offsets[i + 1]], the matching road lengths are
+        lengths[slot_edges[offsets[i]:offsets[i + 1]]].
+
+        :return: Tuple (offsets, neighbours, slot_edges)
+        '''
+        self._build()
+        return self._offsets, self._neighbours, self._slot_edges
+
+
+class Connectivity:
+    '''
+    Union-find connectivity tracker over a RoadNetwork.
+
+    Attached as an observer, added roads are merged incrementally. Union-find cannot split
+    components, so a removed road only marks the structure stale and it is rebuilt from the
+    edge list on the next query.
+    '''
+
+    def __init__(self, network: RoadNetwork) -> None:
+        '''
+        Initializes the tracker from the current roads of a network.
+
+        :param network: RoadNetwork to track
+        '''
+        self.network = network
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        '''
+        Recomputes the components from the network's edge list.
+
+        :return: None
+        '''
+        n = len(self.network.adjacency)
+        self.parent = list(range(n))
+        self.rank = [0] * n
+        self.components = n
+        self.stale = False
+        for a, b in self.network.edges.tolist():
+            self.union(a, b)
+
+    def find(self, a: int) -> int:
+        '''
+        Returns the representative town of a component (with path halving).
+
+        :param a: Town ID
+        :return: Representative town ID
+        '''
+        parent = self.parent
+        while parent[a] != a:
+            parent[a] = parent[parent[a]]
+            a = parent[a]
+        return a
+
+    def union(self, a: int, b: int) -> bool:
+        '''
+        Merges the components of two towns.
+
+        :param a: First town ID
+        :param b: Second town ID
+        :return: True if two components were merged, False if already connected
+        '''
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return False
+        if self.rank[ra] < self.rank[rb]:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        if self.rank[ra] == self.rank[rb]:
+            self.rank[ra] += 1
+        self.components -= 1
+        return True
+
+    def roadAdded(self, a: int, b: int) -> None:
+        if not self.stale:
+            self.union(a, b)
+
+    def roadRemoved(self, a: int, b: int) -> None:
+        self.stale = True
+
+    def _refresh(self) -> None:
+        if self.stale or len(self.parent) != len(self.network.adjacency):
+            self.rebuild()
+
+    def connected(self, a: int, b: int) -> bool:
+        '''
+        Checks if two towns are connected via roads.
+
+        :param a: First town ID
+        :param b: Second town ID
+        :return: True if connected, False otherwise
+        '''
+        self._refresh()
+        return self.find(a) == self.find(b)
+
+    def isConnected(self) -> bool:
+        '''
+        Checks if all towns are connected via roads (graph is connected).
+
+        :return: True if connected, False otherwise
+        '''
+        self._refresh()
+        return self.components <= 1
+
+    def labels(self) -> np.ndarray:
+        '''
+        Component label of every town.
+
+        :return: Array of representative town IDs
+        '''
+        self._refresh()
+        return np.array([self.find(a) for a in range(len(self.parent))], dtype=np.int32)
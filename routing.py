@@ -0,0 +1,312 @@
+'''
+Routing module
+'''
+from __future__ import annotations
+
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from town import TownTable
+
+FLOYD_WARSHALL_LIMIT = 400  # largest map solved with the dense Floyd-Warshall
+
+_worker_graph = None
+
+
+def hubField(offsets: np.ndarray, neighbours: np.ndarray, slot_edges: np.ndarray, lengths: np.ndarray, sources: list) -> tuple:
+    '''
+    Multi-source Dijkstra over a CSR road graph. Every town gets the distance to its nearest
+    source, the next town on the way there and the source it leads to.
+
+    :param offsets: CSR offsets (see RoadNetwork.csr)
+    :param neighbours: CSR neighbour array
+    :param slot_edges: CSR road index of every neighbour slot
+    :param lengths: Road lengths
+    :param sources: IDs of the source towns
+    :return: Tuple (distance float64, next_hop int32, hub int32, via int32) where via is the
+        road to the next hop (-1 at sources); unreachable towns have infinite distance and -1
+        as next hop, hub and via
+    '''
+    n = len(offsets) - 1
+    offsets = offsets.tolist()
+    neighbours = neighbours.tolist()
+    slot_lengths = lengths[slot_edges].tolist()
+    slot_edges = slot_edges.tolist()
+    dist = [float('inf')] * n
+    next_hop = [-1] * n
+    hub = [-1] * n
+    via = [-1] * n
+
+    heap = []
+    for s in sources:
+        dist[s] = 0.0
+        next_hop[s] = s
+        hub[s] = s
+        heap.append((0.0, s))
+    heapq.heapify(heap)
+
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        for slot in range(offsets[u], offsets[u + 1]):
+            v = neighbours[slot]
+            nd = d + slot_lengths[slot]
+            if nd < dist[v]:
+                dist[v] = nd
+                next_hop[v] = u
+                hub[v] = hub[u]
+                via[v] = slot_edges[slot]
+                heapq.heappush(heap, (nd, v))
+
+    return np.array(dist), np.array(next_hop, dtype=np.int32), np.array(hub, dtype=np.int32), np.array(via, dtype=np.int32)
+
+
+class HubRoutes:
+    '''
+    Cached shortest-path field from every town to its nearest Main town.
+
+    The field is computed with one multi-source Dijkstra and recomputed only when the roads
+    (RoadNetwork.version) or the Main towns (TownTable.mainVersion) change, so route lookups
+    cost O(path length).
+    '''
+
+    def __init__(self, towns: TownTable) -> None:
+        '''
+        Initializes an empty route cache.
+
+        :param towns: TownTable to route over
+        '''
+        self.towns = towns
+        self._key = None
+        self._distance = None
+        self._next_hop = None
+        self._hub = None
+
+    def refresh(self) -> None:
+        '''
+        Recomputes the field if the roads or the Main towns have changed.
+
+        :return: None
+        '''
+        key = (self.towns.roads.version, self.towns.mainVersion)
+        if key == self._key:
+            return None
+        offsets, neighbours, slot_edges = self.towns.roads.csr()
+        sources = np.flatnonzero(self.towns.isMain).tolist()
+        self._distance, self._next_hop, self._hub, _ = hubField(offsets, neighbours, slot_edges, self.towns.roads.lengths, sources)
+        self._key = key
+
+    @property
+    def distance(self) -> np.ndarray:
+        '''
+        Road distance from every town to its nearest Main town.
+        '''
+        self.refresh()
+        return self._distance
+
+    @property
+    def nextHop(self) -> np.ndarray:
+        '''
+        Next town on the shortest route to the nearest Main town (the town itself for Main towns).
+        '''
+        self.refresh()
+        return self._next_hop
+
+    @property
+    def hub(self) -> np.ndarray:
+        '''
+        Nearest Main town of every town.
+        '''
+        self.refresh()
+        return self._hub
+
+    def route(self, town: int) -> list:
+        '''
+        Shortest route from a town to its nearest Main town.
+
+        :param town: Town ID
+        :return: List of town IDs from the town to the Main town, empty if none is reachable
+        '''
+        next_hop = self.nextHop
+        if next_hop[town] < 0:
+            return []
+        path = [town]
+        while next_hop[town] != town:
+            town = int(next_hop[town])
+            path.append(town)
+        return path
+
+
+def singleSource(offsets: list, neighbours: list, slot_lengths: list, source: int) -> tuple:
+    '''
+    Dijkstra from one town, recording the first town of every shortest route.
+
+    :param offsets: CSR offsets as a list
+    :param neighbours: CSR neighbour array as a list
+    :param slot_lengths: Road length of every neighbour slot as a list
+    :param source: Source town ID
+    :return: Tuple (distance list, first hop list), -1 as first hop for unreachable towns
+    '''
+    n = len(offsets) - 1
+    dist = [float('inf')] * n
+    first = [-1] * n
+    dist[source] = 0.0
+    first[source] = source
+    heap = [(0.0, source)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        for slot in range(offsets[u], offsets[u + 1]):
+            v = neighbours[slot]
+            nd = d + slot_lengths[slot]
+            if nd < dist[v]:
+                dist[v] = nd
+                first[v] = v if u == source else first[u]
+                heapq.heappush(heap, (nd, v))
+    return dist, first
+
+
+def _initWorker(offsets: list, neighbours: list, slot_lengths: list) -> None:
+    global _worker_graph
+    _worker_graph = (offsets, neighbours, slot_lengths)
+
+
+def _dijkstraRows(sources: list) -> tuple:
+    dist = np.empty((len(sources), len(_worker_graph[0]) - 1), dtype=np.float32)
+    first = np.empty(dist.shape, dtype=np.int32)
+    for row, source in enumerate(sources):
+        dist[row], first[row] = singleSource(*_worker_graph, source)
+    return dist, first
+
+
+def pairRoute(towns: TownTable, a: int, b: int) -> tuple:
+    '''
+    Shortest road route between two towns, read from the map's distance matrix when it
+    has one (see mapcache), otherwise found with a Dijkstra towards b.
+
+    :param towns: Table of towns
+    :param a: Start town ID
+    :param b: End town ID
+    :return: Tuple (distance, list of town IDs from a to b); (inf, []) if b is unreachable
+    '''
+    if towns.distances is not None:
+        return towns.distances.cost(a, b), towns.distances.route(a, b)
+    offsets, neighbours, slot_edges = towns.roads.csr()
+    dist, next_hop, _, _ = hubField(offsets, neighbours, slot_edges, towns.roads.lengths, [b])
+    if next_hop[a] < 0:
+        return float('inf'), []
+    path = [a]
+    while a != b:
+        a = int(next_hop[a])
+        path.append(a)
+    return float(dist[path[0]]), path
+
+
+def floydWarshall(n: int, edges: np.ndarray, lengths: np.ndarray) -> tuple:
+    '''
+    Dense all-pairs shortest paths, vectorized over one intermediate town per step.
+
+    :param n: Number of towns
+    :param edges: (E, 2) road array
+    :param lengths: Road lengths
+    :return: Tuple (distance float64 matrix, next hop int32 matrix)
+    '''
+    dist = np.full((n, n), np.inf)
+    next_hop = np.full((n, n), -1, dtype=np.int32)
+    a, b = edges[:, 0], edges[:, 1]
+    dist[a, b] = lengths
+    dist[b, a] = lengths
+    next_hop[a, b] = b
+    next_hop[b, a] = a
+    diagonal = np.arange(n)
+    dist[diagonal, diagonal] = 0.0
+    next_hop[diagonal, diagonal] = diagonal
+    for k in range(n):
+        through = dist[:, k, None] + dist[None, k, :]
+        better = through < dist
+        dist = np.where(better, through, dist)
+        next_hop = np.where(better, next_hop[:, k, None], next_hop)
+    return dist, next_hop
+
+
+def allPairs(towns: TownTable, method: str = 'auto', workers: int = None) -> DistanceMatrix:
+    '''
+    Shortest road distances and next hops between every pair of towns.
+
+    :param towns: Table of towns
+    :param method: 'floyd-warshall', 'dijkstra' or 'auto' (Floyd-Warshall up to FLOYD_WARSHALL_LIMIT towns)
+    :param workers: Processes for repeated Dijkstra, defaults to the CPU count
+    :return: DistanceMatrix
+    '''
+    n = len(towns)
+    roads = towns.roads
+    if method == 'auto':
+        method = 'floyd-warshall' if n <= FLOYD_WARSHALL_LIMIT else 'dijkstra'
+
+    if method == 'floyd-warshall':
+        dist, next_hop = floydWarshall(n, roads.edges, roads.lengths)
+        return DistanceMatrix(dist.astype(np.float32), next_hop)
+
+    offsets, neighbours, slot_edges = roads.csr()
+    graph = (offsets.tolist(), neighbours.tolist(), roads.lengths[slot_edges].tolist())
+    workers = workers or os.cpu_count() or 1
+    chunks = [list(range(start, min(start + 256, n))) for start in range(0, n, 256)]
+    if workers == 1 or len(chunks) == 1:
+        _initWorker(*graph)
+        rows = [_dijkstraRows(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(workers, initializer=_initWorker, initargs=graph) as pool:
+            rows = list(pool.map(_dijkstraRows, chunks))
+    dist = np.concatenate([r[0] for r in rows]) if rows else np.zeros((0, 0), dtype=np.float32)
+    next_hop = np.concatenate([r[1] for r in rows]) if rows else np.zeros((0, 0), dtype=np.int32)
+    return DistanceMatrix(dist, next_hop)
+
+
+class DistanceMatrix:
+    '''
+    All-pairs route costs as compact float32 distance and int32 next-hop matrices.
+    The matrices can be memory-mapped from disk (see mapcache), so lookups are plain array reads.
+    '''
+
+    def __init__(self, distance: np.ndarray, next_hop: np.ndarray) -> None:
+        '''
+        Wraps precomputed matrices.
+
+        :param distance: (n, n) float32 road distances, inf if unreachable
+        :param next_hop: (n, n) int32 first town on the route from row to column, -1 if unreachable
+        '''
+        self.distance = distance
+        self.nextHop = next_hop
+
+    def cost(self, a: int, b: int) -> float:
+        '''
+        Road distance between two towns.
+
+        :param a: First town ID
+        :param b: Second town ID
+        :return: Distance
+        '''
+        return float(self.distance[a, b])
+
+    def route(self, a: int, b: int) -> list:
+        '''
+        Shortest route between two towns.
+
+        :param a: Start town ID
+        :param b: End town ID
+        :return: List of town IDs from a to b, empty if b is unreachable
+        '''
+        if self.nextHop[a, b] < 0:
+            return []
+        path = [a]
+        while a != b:
+            a = int(self.nextHop[a, b])
+            path.append(a)
+        return path
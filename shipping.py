@@ -0,0 +1,145 @@
+'''
+Shipping module
+
+Moves warehouse stock between towns along the roads once a week. Every town wants to keep
+RESERVE_WEEKS of its own consumption in stock; what it holds above that is surplus, what it
+lacks is deficit. Only towns with a surplus send and only towns with a deficit receive; towns in
+between just relay. The week's shipments are found with successive shortest paths over the CSR
+road graph: each round one multi-source Dijkstra from the surplus towns, weighted by road
+length, gives every deficit town its cheapest route to the nearest surplus, and stock is pushed
+along those routes up to the surplus, the deficit and the capacity left on the roads.
+'''
+import numpy as np
+
+from economy import FOOD, GOODS
+from routing import hubField
+from town import TownTable
+
+EPSILON = 1e-6  # smaller amounts are not shipped
+
+
+def roadCapacity(lengths: np.ndarray, cnst: dict) -> np.ndarray:
+    '''
+    Units a road can carry per week: ROAD_CAPACITY over a road of MAX_ROAD_LENGTH and
+    inversely more over shorter roads, at most four times as much.
+
+    :param lengths: Road lengths
+    :param cnst: Constants dictionary (see constants.json)
+    :return: Capacity of every road
+    '''
+    reference = cnst['MAX_ROAD_LENGTH']
+    return cnst['ROAD_CAPACITY'] * reference / np.maximum(lengths, reference / 4)
+
+
+def _routeHops(sinks: np.ndarray, next_hop: np.ndarray, via: np.ndarray) -> tuple:
+    # walks the routes of all sinks towards their sources one hop per step
+    shipments, roads, entered = [], [], []
+    index = np.arange(len(sinks))
+    town = sinks
+    while len(town):
+        road = via[town]
+        moving = road >= 0
+        index, town, road = index[moving], town[moving], road[moving]
+        shipments.append(index)
+        roads.append(road)
+        entered.append(town)
+        town = next_hop[town]
+    return np.concatenate(shipments), np.concatenate(roads), np.concatenate(entered)
+
+
+def transport(roads, stock: np.ndarray, target: np.ndarray, capacity: np.ndarray, fee: np.ndarray, rounds: int) -> tuple:
+    '''
+    Ships one good from surplus towns to deficit towns along the cheapest roads.
+
+    Each round runs hubField from every town still holding a surplus over the roads with
+    capacity left. Every source serves its deficit towns nearest first until its surplus runs
+    out; where the shipments of a round overload a road, all shipments over it are cut to the
+    same share of its capacity, and the capacity left is used by the next round. This is a
+    greedy approximation of a min-cost flow: shipments are never rerouted or cancelled, and
+    at most rounds Dijkstra runs are made.
+
+    :param roads: RoadNetwork the towns are connected by
+    :param stock: Stock of every town, updated in place
+    :param target: Stock every town wants to hold
+    :param capacity: Units every road can still carry, updated in place
+    :param fee: Fee of every town, charged on the units entering it
+    :param rounds: Maximum number of Dijkstra runs
+    :return: Tuple (net units shipped on every road, positive from the first to the second
+        town; fee-weighted units received by every town; fee-weighted units paid by every town)
+    '''
+    n = len(stock)
+    first = roads.edges[:, 0]
+    e = len(first)
+    flow = np.zeros(e)
+    received = np.zeros(n)
+    paid = np.zeros(n)
+    offsets, neighbours, slot_edges = roads.csr()
+
+    for _ in range(rounds):
+        surplus = stock - target
+        sources = np.flatnonzero(surplus > EPSILON)
+        sinks = np.flatnonzero(surplus < -EPSILON)
+        if not len(sources) or not len(sinks):
+            break
+
+        lengths = np.where(capacity > EPSILON, roads.lengths, np.inf)
+        dist, next_hop, hub, via = hubField(offsets, neighbours, slot_edges, lengths, sources.tolist())
+        sinks = sinks[np.isfinite(dist[sinks])]
+        if not len(sinks):
+            break
+
+        sinks = sinks[np.lexsort((dist[sinks], hub[sinks]))]
+        source = hub[sinks]
+        demand = -surplus[sinks]
+        served_before = np.cumsum(demand) - demand
+        group = np.flatnonzero(np.r_[True, source[1:] != source[:-1]])
+        served_before -= np.repeat(served_before[group], np.diff(np.r_[group, len(sinks)]))
+        amount = np.clip(surplus[source] - served_before, 0.0, demand)
+
+        shipment, road, entered = _routeHops(sinks, next_hop, via)
+        load = np.bincount(road, weights=amount[shipment], minlength=e)
+        share = np.divide(capacity, load, out=np.ones(e), where=load > capacity)
+        scale = np.ones(len(sinks))
+        np.minimum.at(scale, shipment, share[road])
+        amount *= scale
+        if amount.sum() <= EPSILON:
+            break
+
+        carried = amount[shipment]
+        capacity -= np.bincount(road, weights=carried, minlength=e)
+        np.maximum(capacity, 0.0, out=capacity)  # rounding must not leave negative capacity
+        flow += np.bincount(road, weights=np.where(first[road] == entered, -carried, carried), minlength=e)
+        toll = fee[entered] * carried
+        received += np.bincount(entered, weights=toll, minlength=n)
+        paid += np.bincount(source[shipment], weights=toll, minlength=n)
+        stock += np.bincount(sinks, weights=amount, minlength=n) - np.bincount(source, weights=amount, minlength=n)
+
+    return flow, received, paid
+
+
+def weeklyShipping(towns: TownTable, cnst: dict) -> np.ndarray:
+    '''
+    Runs one week of shipments over the whole network. Food is shipped first and goods use
+    the capacity it leaves. Every town a shipment enters, relay towns included, charges its
+    fee on the value of the shipment, paid by the sender.
+
+    :param towns: Table of towns
+    :param cnst: Constants dictionary (see constants.json)
+    :return: (E, 2) array of the net food and goods flow on every road of towns.roads.edges,
+        positive from the first to the second town
+    '''
+    roads = towns.roads
+    flows = np.zeros((len(roads.edges), 2))
+    if not len(roads.edges):
+        return flows
+
+    capacity = roadCapacity(roads.lengths, cnst)
+    pop = towns.population.astype(np.float64)
+    for good, consumption, price in ((FOOD, 'FOOD_CONSUMPTION', 'FOOD_PRICE'), (GOODS, 'GOODS_CONSUMPTION', 'GOODS_PRICE')):
+        stock = towns.warehouse[:, good].astype(np.float64)
+        target = cnst[consumption] * pop * cnst['RESERVE_WEEKS']
+        flows[:, good], received, paid = transport(roads, stock, target, capacity, towns.fee, cnst['SHIPPING_ROUNDS'])
+        towns.warehouse[:, good] = stock
+        towns.saldo += (received - paid) * cnst[price]
+
+    return flows
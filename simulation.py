@@ -0,0 +1,430 @@
+'''
+Simulation module
+'''
+import json
+import math
+import os
+import queue
+import threading
+import time
+from typing import Callable
+
+import numpy as np
+
+import builder
+import economy
+import mapcache
+import profiler
+import shipping
+from recorder import Recorder, nextRecordingPath
+from town import TownTable
+
+CYCLES_PER_WEEK = 50
+
+
+class Simulation:
+    '''
+    Headless simulation engine. Holds the map and the simulated clock and advances
+    them as fast as the CPU allows, independently of any viewer.
+    '''
+
+    def __init__(self, towns: TownTable, cnst: dict = None, seed: int = None) -> None:
+        '''
+        Initializes a Simulation over an already generated map.
+
+        :param towns: Table of towns
+        :param cnst: Constants dictionary, defaults to constants.json
+        :param seed: Seed of the run, None for a nondeterministic run
+        '''
+        self.towns = towns
+        self.cnst = cnst if cnst is not None else builder.CNST
+        self.seed = seed
+        self.rng = builder.makeRng(seed, 'simulation')
+        self.cycles = 0
+        self.weeks = 0
+        self.recorder = None
+        self.shipments = None  # net (food, goods) flow on every road during the last week
+
+    @classmethod
+    def generate(cls, cnst: dict, generation_type: int = 4, placement: str = 'rejection', seed: int = None, cache_dir: str = None) -> 'Simulation | None':
+        '''
+        Builds a new map from the given constants and wraps it in a Simulation.
+
+        :param cnst: Constants dictionary (see constants.json)
+        :param generation_type: Type of road generation
+        :param placement: Town placement mode, 'rejection' or 'poisson'
+        :param seed: Seed of the run, None for a random map
+        :param cache_dir: Map cache directory, seeded maps are loaded from / saved to it
+        :return: Simulation object or None if map generation fails
+        '''
+        if seed is not None and cache_dir is not None:
+            towns = mapcache.cachedMap(seed, cnst, generation_type, placement, cache_dir=cache_dir)
+        else:
+            towns = builder.initializeMap(cnst['TOWN_NUM'], cnst['START_POPULATION'], cnst['START_WAREHOUSE'], cnst['POP_CF'], cnst['WIDTH'], cnst['HEIGHT'], generation_type=generation_type, placement=placement, seed=seed, cnst=cnst)
+        if towns is None:
+            return None
+        return cls(towns, cnst, seed)
+
+    def step(self, n: int = 1) -> int:
+        '''
+        Advances the simulation by n cycles. Cycles between week boundaries carry no
+        work, so the clock jumps straight from one week boundary to the next.
+
+        :param n: Number of cycles to advance
+        :return: Number of weeks completed during this call
+        '''
+        start_week = self.weeks
+        target = self.cycles + n
+        while self.cycles < target:
+            next_week = (self.weeks + 1) * CYCLES_PER_WEEK
+            if next_week > target:
+                self.cycles = target
+                break
+            self.cycles = next_week
+            self.weeks += 1
+            self.tickWeek()
+        return self.weeks - start_week
+
+    def run_until(self, week: int) -> int:
+        '''
+        Advances the simulation until the given week is reached.
+
+        :param week: Week number to stop at
+        :return: Number of weeks completed during this call
+        '''
+        if week <= self.weeks:
+            return 0
+        return self.step(week * CYCLES_PER_WEEK - self.cycles)
+
+    def tickWeek(self) -> None:
+        '''
+        Runs the weekly update of the map.
+
+        :return: None
+        '''
+        with profiler.timer('sim_week'):
+            economy.weeklyTick(self.towns, self.cnst, np.random.default_rng(self.rng.getrandbits(64)))
+        with profiler.timer('shipping'):
+            self.shipments = shipping.weeklyShipping(self.towns, self.cnst)
+        if self.recorder is not None:
+            self.recorder.record(self.towns, self.weeks)
+
+    def checkpoint(self) -> dict:
+        '''
+        Copies the complete state of the run: towns, roads, random generator state, clock
+        and constants.
+
+        :return: Checkpoint dictionary, see restore() and saveCheckpoint()
+        '''
+        return {
+            'towns': self.towns.toArrays(),
+            'cycles': self.cycles,
+            'weeks': self.weeks,
+            'seed': self.seed,
+            'rng': self.rng.getstate(),
+            'cnst': dict(self.cnst),
+        }
+
+    def restore(self, checkpoint: dict) -> None:
+        '''
+        Returns the run to a checkpoint. A checkpoint of the same map only overwrites the
+        columns that change during a run; any other map is rebuilt. An attached recording
+        is cut back to the checkpoint's week, or, for another map, closed and replaced by a
+        new recording in the next numbered directory next to it.
+
+        :param checkpoint: Checkpoint made by checkpoint() or loadCheckpoint()
+        :return: None
+        '''
+        arrays = checkpoint['towns']
+        towns = self.towns
+        same_map = (len(arrays['x']) == len(towns) and np.array_equal(arrays['x'], towns.x) and np.array_equal(arrays['y'], towns.y)
+                    and np.array_equal(arrays['edges'], towns.roads.edges))
+        if same_map:
+            towns.loadColumns(arrays)
+        else:
+            self.towns = TownTable.fromArrays(arrays)
+        self.cycles = checkpoint['cycles']
+        self.weeks = checkpoint['weeks']
+        self.seed = checkpoint['seed']
+        self.rng.setstate(checkpoint['rng'])
+        self.cnst = dict(checkpoint['cnst'])
+
+        if self.recorder is None:
+            return None
+        if same_map:
+            if not self.recorder.truncate(self.weeks):
+                self.recorder.record(self.towns, self.weeks)  # the checkpoint predates the recording
+        else:
+            path = self.recorder.path
+            self.recorder.close()
+            self.startRecording(nextRecordingPath(os.path.dirname(os.path.abspath(path))))
+
+    @classmethod
+    def fromCheckpoint(cls, checkpoint: dict) -> 'Simulation':
+        '''
+        Builds a new Simulation from a checkpoint.
+
+        :param checkpoint: Checkpoint made by checkpoint() or loadCheckpoint()
+        :return: Simulation object
+        '''
+        sim = cls(TownTable.fromArrays(checkpoint['towns']), dict(checkpoint['cnst']), checkpoint['seed'])
+        sim.restore(checkpoint)
+        return sim
+
+    def fork(self, n: int = 1, overrides: list = None) -> list:
+        '''
+        Branches the run into child runs that continue from the current week. Children copy
+        only the columns that change during a run and share the map with this run, so the
+        simulated prefix is paid for once.
+
+        :param n: Number of children
+        :param overrides: Optional list of n constant overrides, one per child
+        :return: List of Simulation objects
+        '''
+        state = self.rng.getstate()
+        children = []
+        for i in range(n):
+            cnst = {**self.cnst, **(overrides[i] if overrides else {})}
+            child = Simulation(self.towns.fork(), cnst, self.seed)
+            child.cycles = self.cycles
+            child.weeks = self.weeks
+            child.rng.setstate(state)
+            children.append(child)
+        return children
+
+    def startRecording(self, path: str) -> Recorder:
+        '''
+        Records the current week and every following week to a new recording.
+
+        :param path: Recording directory
+        :return: Recorder, close it when the run ends
+        '''
+        self.recorder = Recorder(path, self.towns, self.seed)
+        self.recorder.record(self.towns, self.weeks)
+        return self.recorder
+
+
+def saveCheckpoint(checkpoint: dict, path: str) -> None:
+    '''
+    Writes a checkpoint as one uncompressed .npz file.
+
+    :param checkpoint: Checkpoint made by Simulation.checkpoint()
+    :param path: Output file
+    :return: None
+    '''
+    version, state, gauss = checkpoint['rng']
+    meta = {
+        'cycles': checkpoint['cycles'],
+        'weeks': checkpoint['weeks'],
+        'seed': checkpoint['seed'],
+        'rng_version': version,
+        'rng_gauss': gauss,
+        'cnst': checkpoint['cnst'],
+    }
+    with open(path, 'wb') as f:
+        np.savez(f, meta=np.array(json.dumps(meta)), rng=np.array(state, dtype=np.int64), **checkpoint['towns'])
+
+
+def loadCheckpoint(path: str) -> dict:
+    '''
+    Reads a checkpoint written by saveCheckpoint.
+
+    :param path: Checkpoint file
+    :return: Checkpoint dictionary
+    '''
+    with np.load(path) as arrays:
+        meta = json.loads(str(arrays['meta']))
+        towns = {key: arrays[key] for key in arrays.files if key not in ('meta', 'rng')}
+        state = tuple(arrays['rng'].tolist())
+    return {
+        'towns': towns,
+        'cycles': meta['cycles'],
+        'weeks': meta['weeks'],
+        'seed': meta['seed'],
+        'rng': (meta['rng_version'], state, meta['rng_gauss']),
+        'cnst': meta['cnst'],
+    }
+
+
+class Snapshot:
+    '''
+    Immutable state of a running simulation as published by a SimulationWorker.
+    '''
+    __slots__ = ('towns', 'cycles', 'weeks', 'selected', 'speed')
+
+    def __init__(self, towns: TownTable, cycles: int, weeks: int, selected: int | None, speed: float) -> None:
+        '''
+        Initializes a Snapshot.
+
+        :param towns: Read-only table of towns (see TownTable.snapshot)
+        :param cycles: Simulation cycle
+        :param weeks: Simulation week
+        :param selected: ID of the selected town, None if no town is selected
+        :param speed: Simulation speed in cycles per second
+        '''
+        self.towns = towns
+        self.cycles = cycles
+        self.weeks = weeks
+        self.selected = selected
+        self.speed = speed
+
+    @property
+    def selectedTown(self):
+        '''
+        View of the selected town, None if no town is selected.
+        '''
+        return None if self.selected is None else self.towns[self.selected]
+
+
+class SimulationWorker(threading.Thread):
+    '''
+    Runs a Simulation on a background thread at a set speed and publishes Snapshots, so a
+    slow week never stalls the viewer and a slow frame never stalls the simulation.
+
+    The viewer only reads the latest snapshot and talks back through send():
+    ('restart',), ('select', town ID or None), ('speed', cycles per second), ('checkpoint',),
+    ('restore',) to return to the last checkpoint, ('stop',).
+    '''
+
+    def __init__(self, factory: Callable[[], 'Simulation | None'], speed: float = 60.0, publish_rate: float = 60.0) -> None:
+        '''
+        Initializes a worker, the map is generated once the thread starts.
+
+        :param factory: Function returning a new Simulation, or None if generation fails
+        :param speed: Cycles per second, 0 pauses and math.inf runs as fast as possible
+        :param publish_rate: Maximum number of snapshots published per second
+        '''
+        super().__init__(name='simulation', daemon=True)
+        self.factory = factory
+        self.speed = speed
+        self.publishInterval = 1.0 / publish_rate
+        self.commands = queue.Queue()
+        self.sim = None
+        self.selected = None
+        self.snapshot = None
+        self.saved = None
+        self.error = None
+        self._owed = 0.0
+        self._last = time.perf_counter()
+        self._published = -math.inf
+        self._changed = False
+
+    def send(self, command: str, *args) -> None:
+        '''
+        Queues a command for the simulation thread.
+
+        :param command: 'restart', 'select', 'speed', 'checkpoint', 'restore' or 'stop'
+        :param args: Command arguments
+        :return: None
+        '''
+        self.commands.put((command, *args))
+
+    def restart(self) -> bool:
+        '''
+        Replaces the simulation with a new one from the factory.
+
+        :return: False if the factory failed
+        '''
+        self.close()
+        self.sim = self.factory()
+        self.selected = None
+        self._owed = 0.0
+        self._last = time.perf_counter()
+        self._changed = True
+        if self.sim is None:
+            self.error = 'Could not generate a fully-connected map after multiple attempts.'
+            return False
+        return True
+
+    def close(self) -> None:
+        '''
+        Closes the recorder of the current simulation, if it has one.
+
+        :return: None
+        '''
+        if self.sim is not None and self.sim.recorder is not None:
+            self.sim.recorder.close()
+            self.sim.recorder = None
+
+    def publish(self) -> None:
+        '''
+        Publishes the current state as a new Snapshot.
+
+        :return: None
+        '''
+        sim = self.sim
+        self.snapshot = Snapshot(sim.towns.snapshot(), sim.cycles, sim.weeks, self.selected, self.speed)
+        self._published = time.perf_counter()
+        self._changed = False
+
+    def handle(self, command: tuple) -> bool:
+        '''
+        Applies one command.
+
+        :param command: Command tuple, see send()
+        :return: False if the worker should stop
+        '''
+        name, *args = command
+        if name == 'restart':
+            return self.restart()
+        if name == 'select':
+            self.selected = args[0]
+        elif name == 'speed':
+            self.speed = max(args[0], 0.0)
+            self._owed = 0.0
+            self._last = time.perf_counter()
+        elif name == 'checkpoint':
+            self.saved = self.sim.checkpoint()
+        elif name == 'restore' and self.saved is not None:
+            self.sim.restore(self.saved)
+        elif name == 'stop':
+            self.close()
+            return False
+        self._changed = True
+        return True
+
+    def _timeout(self) -> float | None:
+        '''
+        How long the thread can sleep before it has work to do.
+
+        :return: Seconds, None to sleep until the next command
+        '''
+        timeout = None
+        if self.speed > 0:
+            until_week = (self.sim.weeks + 1) * CYCLES_PER_WEEK - self.sim.cycles - self._owed
+            timeout = max(until_week / self.speed, 0.0)
+        if self._changed:
+            until_publish = max(self._published + self.publishInterval - time.perf_counter(), 0.0)
+            timeout = until_publish if timeout is None else min(timeout, until_publish)
+        return timeout
+
+    def run(self) -> None:
+        if not self.restart():
+            return None
+        while True:
+            try:
+                command = self.commands.get(timeout=self._timeout())
+                if not self.handle(command):
+                    return None
+                while True:
+                    if not self.handle(self.commands.get_nowait()):
+                        return None
+            except queue.Empty:
+                pass
+
+            now = time.perf_counter()
+            sim = self.sim
+            to_week = (sim.weeks + 1) * CYCLES_PER_WEEK - sim.cycles
+            if math.isinf(self.speed):
+                cycles = to_week
+            else:
+                # Never owe more than a second of cycles, a slow week must not snowball
+                self._owed = min(self._owed + (now - self._last) * self.speed, max(self.speed, CYCLES_PER_WEEK))
+                cycles = min(int(self._owed), to_week)
+                self._owed -= cycles
+            self._last = now
+            # One week at most per pass, so commands are picked up between weeks
+            if cycles and sim.step(cycles):
+                self._changed = True
+            if self._changed and now - self._published >= self.publishInterval:
+                self.publish()
@@ -0,0 +1,408 @@
+'''
+Spatial module
+'''
+import math
+import random
+
+import numpy as np
+
+
+def checkForIntersection(p1: tuple, p2: tuple, p3: tuple, p4: tuple) -> bool:
+    '''
+    Checks if two line segments intersect.
+
+    :param p1: First point of first segment
+    :param p2: Second point of first segment
+    :param p3: First point of second segment
+    :param p4: Second point of second segment
+    :return: True if they intersect, False otherwise
+    '''
+
+    def cp(o, a, b):
+        return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+    check1 = cp(p1, p2, p3) * cp(p1, p2, p4) < 0
+    check2 = cp(p3, p4, p1) * cp(p3, p4, p2) < 0
+
+    return check1 and check2
+
+
+def pointsNearSegment(px: np.ndarray, py: np.ndarray, x1: float, y1: float, x2: float, y2: float, radius: float) -> np.ndarray:
+    '''
+    Checks a batch of points against a line segment at once.
+
+    :param px: X coordinates of the points
+    :param py: Y coordinates of the points
+    :param x1: X of line start
+    :param y1: Y of line start
+    :param x2: X of line end
+    :param y2: Y of line end
+    :param radius: Clearance distance
+    :return: Boolean mask, True where a point is within radius of the segment
+    '''
+    dx = x2 - x1
+    dy = y2 - y1
+    denom = dx * dx + dy * dy
+    if denom == 0:
+        t = 0.0
+    else:
+        t = np.clip(((px - x1) * dx + (py - y1) * dy) / denom, 0.0, 1.0)
+    nx = x1 + t * dx
+    ny = y1 + t * dy
+    return (px - nx) ** 2 + (py - ny) ** 2 <= radius * radius
+
+
+def poissonDisk(num_points: int, width: int, height: int, spacing: float, margin: float, rng: random.Random = random, k: int = 15) -> list:
+    '''
+    Places points with Bridson's Poisson-disk sampling on a background grid.
+
+    The disk radius is derived from the requested point count so that one pass of the sampler
+    produces enough points in O(n); a random subset of num_points of them is returned. Every
+    pair of points is at least spacing apart and every point is at least margin from the border.
+
+    :param num_points: Number of points to place
+    :param width: Map width
+    :param height: Map height
+    :param spacing: Minimum distance between points
+    :param margin: Minimum distance from the map border
+    :param rng: Random generator
+    :param k: Candidates tried around each active point
+    :return: List of (x, y) integer points or None if they do not fit
+    '''
+    x0, y0 = margin, margin
+    x1, y1 = width - margin, height - margin
+    if num_points <= 0 or x1 < x0 or y1 < y0:
+        return [] if num_points <= 0 else None
+    min_radius = spacing + 1.5  # keeps the spacing after rounding to integer coordinates
+    radius = max(min_radius, math.sqrt((x1 - x0) * (y1 - y0) / (2.0 * num_points)))
+
+    while True:
+        # Grid cells hold at most one point; a 2-cell padding removes bounds checks
+        cell = radius / math.sqrt(2)
+        cols = int((x1 - x0) / cell) + 5
+        rows = int((y1 - y0) / cell) + 5
+        grid = [-1] * (cols * rows)
+        neighbourhood = [dy * cols + dx for dy in range(-2, 3) for dx in range(-2, 3) if abs(dx) + abs(dy) < 4]
+        xs = [rng.uniform(x0, x1)]
+        ys = [rng.uniform(y0, y1)]
+        grid[(int((ys[0] - y0) / cell) + 2) * cols + int((xs[0] - x0) / cell) + 2] = 0
+        active = [0]
+        r2 = radius * radius
+        while active:
+            slot = rng.randrange(len(active))
+            px, py = xs[active[slot]], ys[active[slot]]
+            for _ in range(k):
+                angle = rng.uniform(0, 2 * math.pi)
+                dist = radius * math.sqrt(rng.uniform(1, 4))
+                x = px + dist * math.cos(angle)
+                y = py + dist * math.sin(angle)
+                if x < x0 or x > x1 or y < y0 or y > y1:
+                    continue
+                g = (int((y - y0) / cell) + 2) * cols + int((x - x0) / cell) + 2
+                for offset in neighbourhood:
+                    other = grid[g + offset]
+                    if other != -1 and (xs[other] - x) ** 2 + (ys[other] - y) ** 2 < r2:
+                        break
+                else:
+                    grid[g] = len(xs)
+                    active.append(len(xs))
+                    xs.append(x)
+                    ys.append(y)
+                    break
+            else:
+                active[slot] = active[-1]
+                active.pop()
+
+        if len(xs) >= num_points:
+            chosen = rng.sample(range(len(xs)), num_points)
+            return [(round(xs[c]), round(ys[c])) for c in chosen]
+        if radius <= min_radius:
+            return None
+        radius = max(min_radius, radius * 0.85)
+
+
+def kMeans(x: np.ndarray, y: np.ndarray, k: int, rng: random.Random = random, iterations: int = 10, chunk: int = 1 << 22) -> tuple:
+    '''
+    Clusters points with Lloyd's k-means, starting from k random points.
+
+    Each iteration costs O(n * k); the distance matrix is built in blocks of at most chunk
+    entries to bound memory.
+
+    :param x: X coordinates
+    :param y: Y coordinates
+    :param k: Number of clusters
+    :param rng: Random generator
+    :param iterations: Maximum number of iterations, stops early once no point moves
+    :param chunk: Maximum number of distances computed at once
+    :return: Tuple (cluster of every point, centre X array, centre Y array)
+    '''
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    k = max(1, min(k, n))
+    seeds = np.array(rng.sample(range(n), k), dtype=np.int64)
+    cx, cy = x[seeds].copy(), y[seeds].copy()
+    labels = np.full(n, -1, dtype=np.int64)
+    step = max(1, chunk // k)
+    for _ in range(iterations):
+        nearest = np.empty(n, dtype=np.int64)
+        for start in range(0, n, step):
+            dx = x[start:start + step, None] - cx[None, :]
+            dy = y[start:start + step, None] - cy[None, :]
+            nearest[start:start + step] = np.argmin(dx * dx + dy * dy, axis=1)
+        if np.array_equal(nearest, labels):
+            break
+        labels = nearest
+        counts = np.bincount(labels, minlength=k)
+        filled = counts > 0  # an emptied cluster keeps its old centre
+        cx[filled] = np.bincount(labels, weights=x, minlength=k)[filled] / counts[filled]
+        cy[filled] = np.bincount(labels, weights=y, minlength=k)[filled] / counts[filled]
+    return labels, cx, cy
+
+
+def segmentCells(x1: float, y1: float, x2: float, y2: float, cell: float, pad: float = 0.0) -> list:
+    '''
+    Lists the grid cells that contain any point within pad of a segment. Cells are walked
+    column by column along the segment, so a long diagonal road only touches the cells it
+    passes near instead of its whole bounding box.
+
+    :param x1: X of segment start
+    :param y1: Y of segment start
+    :param x2: X of segment end
+    :param y2: Y of segment end
+    :param cell: Cell size
+    :param pad: Distance around the segment to cover
+    :return: List of (column, row) cell keys
+    '''
+    if x1 > x2:
+        x1, y1, x2, y2 = x2, y2, x1, y1
+    dx = x2 - x1
+    slope = (y2 - y1) / dx if dx else 0.0
+    cells = []
+    for cx in range(math.floor((x1 - pad) / cell), math.floor((x2 + pad) / cell) + 1):
+        # Part of the segment that can come within pad of this column
+        lo = max(x1, cx * cell - pad)
+        hi = min(x2, (cx + 1) * cell + pad)
+        if dx:
+            ya = y1 + (lo - x1) * slope
+            yb = y1 + (hi - x1) * slope
+        else:
+            ya, yb = y1, y2
+        if ya > yb:
+            ya, yb = yb, ya
+        for cy in range(math.floor((ya - pad) / cell), math.floor((yb + pad) / cell) + 1):
+            cells.append((cx, cy))
+    return cells
+
+
+class SegmentGrid:
+    '''
+    Uniform grid over road segments for incremental crossing queries.
+
+    Each road is registered in the cells it passes through, so "does this road cross any
+    existing road?" only tests roads sharing a cell with it. Attached to a RoadNetwork as an
+    observer, it follows every road added or removed through the network.
+    '''
+
+    def __init__(self, xs: list, ys: list, cell: float) -> None:
+        '''
+        Initializes an empty segment grid.
+
+        :param xs: X coordinates of the towns
+        :param ys: Y coordinates of the towns
+        :param cell: Cell size
+        '''
+        self.xs = list(xs)
+        self.ys = list(ys)
+        self.cell = cell
+        self.cells = {}
+        self.segments = {}
+
+    def _cellsOf(self, a: int, b: int) -> list:
+        return segmentCells(self.xs[a], self.ys[a], self.xs[b], self.ys[b], self.cell)
+
+    def insert(self, a: int, b: int) -> None:
+        '''
+        Registers the road between towns a and b.
+
+        :param a: First town ID
+        :param b: Second town ID
+        :return: None
+        '''
+        key = (a, b) if a < b else (b, a)
+        if key in self.segments:
+            return None
+        cells = self._cellsOf(a, b)
+        self.segments[key] = cells
+        for c in cells:
+            bucket = self.cells.get(c)
+            if bucket is None:
+                self.cells[c] = {key}
+            else:
+                bucket.add(key)
+
+    def remove(self, a: int, b: int) -> None:
+        '''
+        Unregisters the road between towns a and b.
+
+        :param a: First town ID
+        :param b: Second town ID
+        :return: None
+        '''
+        key = (a, b) if a < b else (b, a)
+        cells = self.segments.pop(key, None)
+        if cells is None:
+            return None
+        for c in cells:
+            bucket = self.cells[c]
+            bucket.discard(key)
+            if not bucket:
+                del self.cells[c]
+
+    def roadAdded(self, a: int, b: int) -> None:
+        self.insert(a, b)
+
+    def roadRemoved(self, a: int, b: int) -> None:
+        self.remove(a, b)
+
+    def clear(self) -> None:
+        '''
+        Removes every road from the grid.
+
+        :return: None
+        '''
+        self.cells = {}
+        self.segments = {}
+
+    def crosses(self, a: int, b: int, cells: list = None) -> bool:
+        '''
+        Checks if the segment between towns a and b crosses any registered road.
+        Roads sharing an endpoint with it do not count as crossings.
+
+        :param a: First town ID
+        :param b: Second town ID
+        :param cells: Precomputed cells of the segment
+        :return: True if it crosses a road, False otherwise
+        '''
+        xs, ys = self.xs, self.ys
+        p1 = (xs[a], ys[a])
+        p2 = (xs[b], ys[b])
+        seen = set()
+        for c in (cells if cells is not None else self._cellsOf(a, b)):
+            for key in self.cells.get(c, ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                c1, c2 = key
+                if c1 == a or c1 == b or c2 == a or c2 == b:
+                    continue
+                if checkForIntersection(p1, p2, (xs[c1], ys[c1]), (xs[c2], ys[c2])):
+                    return True
+        return False
+
+    def anyCrossing(self) -> bool:
+        '''
+        Checks if any two registered roads cross.
+
+        :return: True if a crossing exists, False otherwise
+        '''
+        for (a, b), cells in self.segments.items():
+            if self.crosses(a, b, cells):
+                return True
+        return False
+
+
+class PointGrid:
+    '''
+    Spatial hash of town positions. Segment clearance queries only look at the towns in the
+    cells the segment passes near and test them in one vectorized batch.
+    '''
+
+    def __init__(self, xs: list, ys: list, cell: float) -> None:
+        '''
+        Builds the grid over the given points.
+
+        :param xs: X coordinates of the towns
+        :param ys: Y coordinates of the towns
+        :param cell: Cell size
+        '''
+        self.xs = np.asarray(xs, dtype=np.float64)
+        self.ys = np.asarray(ys, dtype=np.float64)
+        self.cell = cell
+        self.cells = {}
+        cx = np.floor(self.xs / cell).astype(np.int64)
+        cy = np.floor(self.ys / cell).astype(np.int64)
+        order = np.lexsort((cy, cx))
+        keys = np.stack((cx[order], cy[order]), axis=1)
+        if len(order):
+            splits = np.flatnonzero(np.any(keys[1:] != keys[:-1], axis=1)) + 1
+            for ids, key in zip(np.split(order, splits), keys[np.concatenate(([0], splits))].tolist()):
+                self.cells[tuple(key)] = ids
+
+    def nearSegment(self, x1: float, y1: float, x2: float, y2: float, radius: float) -> np.ndarray:
+        '''
+        Finds the towns within radius of a segment.
+
+        :param x1: X of line start
+        :param y1: Y of line start
+        :param x2: X of line end
+        :param y2: Y of line end
+        :param radius: Clearance distance
+        :return: Array of town IDs
+        '''
+        buckets = [self.cells[c] for c in segmentCells(x1, y1, x2, y2, self.cell, radius) if c in self.cells]
+        if not buckets:
+            return np.zeros(0, dtype=np.int64)
+        ids = np.concatenate(buckets)
+        return ids[pointsNearSegment(self.xs[ids], self.ys[ids], x1, y1, x2, y2, radius)]
+
+    def segmentBlocked(self, a: int, b: int, radius: float) -> bool:
+        '''
+        Checks if any town other than the endpoints is too close to the road between a and b.
+
+        :param a: First town ID
+        :param b: Second town ID
+        :param radius: Clearance distance
+        :return: True if too close, False otherwise
+        '''
+        near = self.nearSegment(self.xs[a], self.ys[a], self.xs[b], self.ys[b], radius)
+        return bool(np.any((near != a) & (near != b)))
+
+    def inRect(self, x0: float, y0: float, x1: float, y1: float) -> np.ndarray:
+        '''
+        Finds the towns inside a rectangle.
+
+        :param x0: Left edge
+        :param y0: Top edge
+        :param x1: Right edge
+        :param y1: Bottom edge
+        :return: Array of town IDs
+        '''
+        cx0, cx1 = math.floor(x0 / self.cell), math.floor(x1 / self.cell)
+        cy0, cy1 = math.floor(y0 / self.cell), math.floor(y1 / self.cell)
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) <= len(self.cells):
+            buckets = [self.cells[c] for c in ((cx, cy) for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1)) if c in self.cells]
+        else:
+            # The rectangle spans more cells than are occupied, walk the occupied ones instead
+            buckets = [ids for (cx, cy), ids in self.cells.items() if cx0 <= cx <= cx1 and cy0 <= cy <= cy1]
+        if not buckets:
+            return np.zeros(0, dtype=np.int64)
+        ids = np.concatenate(buckets)
+        xs, ys = self.xs[ids], self.ys[ids]
+        return ids[(xs >= x0) & (xs <= x1) & (ys >= y0) & (ys <= y1)]
+
+    def nearest(self, x: float, y: float, radius: float) -> int | None:
+        '''
+        Finds the town closest to a point within radius.
+
+        :param x: X of the point
+        :param y: Y of the point
+        :param radius: Search radius
+        :return: Town ID or None if no town is that close
+        '''
+        ids = self.inRect(x - radius, y - radius, x + radius, y + radius)
+        if not len(ids):
+            return None
+        d2 = (self.xs[ids] - x) ** 2 + (self.ys[ids] - y) ** 2
+        best = int(np.argmin(d2))
+        return int(ids[best]) if d2[best] <= radius * radius else None
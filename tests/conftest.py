@@ -0,0 +1,28 @@
+'''
+Fixtures shared by the tests.
+'''
+import numpy as np
+import pytest
+
+from town import TownTable
+
+
+@pytest.fixture
+def make_towns():
+    '''
+    Factory of small hand-made maps: make_towns(positions, population, food, roads, fee)
+    adds one Basic town per position. Population and food are one value for every town or
+    one per town.
+    '''
+    def make(positions: list, population=1000, food=1000, roads: list = (), fee: float = None) -> TownTable:
+        towns = TownTable()
+        populations = np.broadcast_to(population, len(positions)).tolist()
+        stocks = np.broadcast_to(food, len(positions)).tolist()
+        for (x, y), people, stock in zip(positions, populations, stocks):
+            towns.add(people, [stock, 0], x, y, False, True, 'Basic')
+        for a, b in roads:
+            towns.roads.add(a, b)
+        if fee is not None:
+            towns.fee[:] = fee
+        return towns
+    return make
@@ -0,0 +1,24 @@
+'''
+Tests of the batch runner.
+'''
+import builder
+import config
+from batch import runBatch
+
+
+def test_overrides_reach_generation_without_leaking():
+    rows = runBatch({'NB_ZONE_TOWN': [30], 'TOWN_NUM': [20]}, [0], 3, placement='poisson', workers=1)
+
+    assert rows[0]['ok'] and rows[0]['towns'] == 20
+    assert builder.CNST is config.CNST
+    assert config.CNST['NB_ZONE_TOWN'] != 30
+
+
+def test_generation_uses_passed_constants():
+    cnst = dict(config.CNST, NB_ZONE_TOWN=60, NB_ZONE_BORDER=20)
+    towns = builder.initializeTowns(30, 1000, [1000, 0], 0.15, 1250, 800, 'poisson', builder.makeRng(1), cnst)
+    dx = towns.x[:, None].astype(float) - towns.x[None, :]
+    dy = towns.y[:, None].astype(float) - towns.y[None, :]
+    spacing = (dx ** 2 + dy ** 2) ** 0.5 + 1e9 * (dx == 0) * (dy == 0)
+
+    assert spacing.min() >= 60
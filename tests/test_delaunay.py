@@ -0,0 +1,56 @@
+'''
+Regression tests of the incremental Delaunay triangulator against the reference
+Bowyer-Watson implementation in builder.
+'''
+import random
+
+import pytest
+
+import builder
+from delaunay import delaunayEdges, triangulate
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_random_maps_match_bowyer_watson(seed, make_towns):
+    rng = random.Random(seed)
+    n = rng.randint(10, 300)
+    side = int((n * 1250 * 800 / 32) ** 0.5)
+    points = {(rng.randint(0, side), rng.randint(0, side)) for _ in range(n)}
+    towns = make_towns(sorted(points))
+
+    assert delaunayEdges(towns.x, towns.y) == builder.delaunay_edges(towns)
+
+
+def inCircle(a: tuple, b: tuple, c: tuple, d: tuple) -> int:
+    # Exact in-circle determinant, positive if d is inside the circle through a, b, c (counter-clockwise)
+    rows = [(p[0] - d[0], p[1] - d[1]) for p in (a, b, c)]
+    rows = [(x, y, x * x + y * y) for x, y in rows]
+    (ax, ay, aw), (bx, by, bw), (cx, cy, cw) = rows
+    return ax * (by * cw - bw * cy) - ay * (bx * cw - bw * cx) + aw * (bx * cy - by * cx)
+
+
+def test_cocircular_grid_is_delaunay(make_towns):
+    # Every grid square has four cocircular corners. Either diagonal is a valid Delaunay
+    # edge, so the two implementations may choose differently; both must triangulate every
+    # square and keep every circumcircle empty.
+    points = [(x * 40, y * 40) for x in range(12) for y in range(9)]
+    towns = make_towns(points)
+    edges = delaunayEdges(towns.x, towns.y)
+    reference = builder.delaunay_edges(towns)
+
+    def sides(edge_set):
+        return {(a, b) for a, b in edge_set if points[a][0] == points[b][0] or points[a][1] == points[b][1]}
+
+    assert len(edges) == len(reference)
+    assert sides(edges) == sides(reference)
+    for a, b, c in triangulate(towns.x.tolist(), towns.y.tolist()):
+        pa, pb, pc = points[a], points[b], points[c]
+        if (pb[0] - pa[0]) * (pc[1] - pa[1]) - (pb[1] - pa[1]) * (pc[0] - pa[0]) < 0:
+            pb, pc = pc, pb
+        assert all(inCircle(pa, pb, pc, p) <= 0 for p in points)
+
+
+def test_small_inputs():
+    assert delaunayEdges([], []) == set()
+    assert delaunayEdges([0, 10], [0, 0]) == set()
+    assert delaunayEdges([0, 10, 0], [0, 0, 10]) == {(0, 1), (1, 2), (0, 2)}
@@ -0,0 +1,25 @@
+'''
+Tests of the vectorized weekly economy.
+'''
+import numpy as np
+
+import builder
+import economy
+
+
+def test_small_town_grows_with_nearest_rounding(make_towns):
+    towns = make_towns([(0, 0)], population=150, food=1e9)
+    economy.weeklyTick(towns, builder.CNST)
+
+    assert towns.population[0] == 151  # 150 * 1.005 = 150.75
+
+
+def test_small_town_keeps_expected_growth_with_stochastic_rounding(make_towns):
+    cnst = builder.CNST
+    towns = make_towns([(0, 0)], population=60, food=1e9)
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        economy.weeklyTick(towns, cnst, rng)
+
+    expected = 60 * (1 + cnst['GROWTH_RATE']) ** 200
+    assert abs(towns.population[0] - expected) < 0.1 * expected
@@ -0,0 +1,29 @@
+'''
+Tests of the profiler timers and counters shared between threads.
+'''
+import threading
+
+import profiler
+
+
+def test_threads_do_not_lose_counts():
+    profiler.enable()
+    profiler.reset()
+
+    def work():
+        for _ in range(2000):
+            profiler.count('events')
+            with profiler.timer('block'):
+                pass
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    while any(thread.is_alive() for thread in threads):
+        profiler.report()  # reading while the threads write must not fail
+    snapshot = profiler.snapshot()
+    profiler.enable(False)
+    profiler.reset()
+
+    assert snapshot['counters']['events'] == 16000
+    assert snapshot['timers']['block']['calls'] == 16000
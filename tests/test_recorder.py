@@ -0,0 +1,73 @@
+'''
+Tests of the run recorder.
+'''
+import pytest
+
+import builder
+from recorder import Recorder, Recording, nextRecordingPath
+from simulation import Simulation
+
+
+@pytest.fixture
+def sim():
+    towns = builder.initializeMap(30, 1000, [1000, 0], 0.15, 1250, 800, 4, placement='poisson', seed=4)
+    return Simulation(towns, seed=4)
+
+
+def test_recording_is_not_overwritten(sim, tmp_path):
+    sim.startRecording(str(tmp_path / 'run'))
+    sim.run_until(3)
+    sim.recorder.close()
+
+    with pytest.raises(FileExistsError):
+        Recorder(str(tmp_path / 'run'), sim.towns)
+    assert len(Recording(str(tmp_path / 'run'))) == 4
+
+
+def test_next_recording_path_numbers_runs(tmp_path):
+    root = str(tmp_path)
+    first = nextRecordingPath(root)
+    Recorder(first, builder.initializeMap(10, 1000, [1000, 0], 0.15, 600, 600, 4, placement='poisson', seed=1)).close()
+
+    assert first.endswith('0')
+    assert nextRecordingPath(root).endswith('1')
+
+
+def test_restore_rewinds_the_recording(sim, tmp_path):
+    sim.startRecording(str(tmp_path / 'run'))
+    sim.run_until(5)
+    checkpoint = sim.checkpoint()
+    sim.run_until(10)
+    sim.restore(checkpoint)
+    sim.run_until(8)
+    sim.recorder.close()
+
+    recording = Recording(str(tmp_path / 'run'))
+    assert recording.week.tolist() == list(range(9))
+
+
+def test_restore_before_recording_started(sim, tmp_path):
+    checkpoint = sim.checkpoint()
+    sim.run_until(3)
+    sim.startRecording(str(tmp_path / 'run'))
+    sim.run_until(6)
+    sim.restore(checkpoint)
+    sim.run_until(2)
+    sim.recorder.close()
+
+    assert Recording(str(tmp_path / 'run')).week.tolist() == [0, 1, 2]
+
+
+def test_restore_of_another_map_starts_a_new_recording(sim, tmp_path):
+    other = Simulation(builder.initializeMap(20, 1000, [1000, 0], 0.15, 1250, 800, 4, placement='poisson', seed=9), seed=9)
+    other.run_until(2)
+    sim.startRecording(str(tmp_path / '0'))
+    sim.run_until(4)
+    sim.restore(other.checkpoint())
+    sim.run_until(5)
+    sim.recorder.close()
+
+    assert Recording(str(tmp_path / '0')).week.tolist() == [0, 1, 2, 3, 4]
+    replaced = Recording(str(tmp_path / '1'))
+    assert replaced.header['towns'] == 20
+    assert replaced.week.tolist() == [2, 3, 4, 5]
@@ -0,0 +1,65 @@
+'''
+Tests of the shortest-path routing and the distance matrices cached with maps.
+'''
+import numpy as np
+import pytest
+
+import builder
+import mapcache
+from routing import allPairs, pairRoute
+
+
+@pytest.fixture(scope='module')
+def towns():
+    cnst = builder.CNST
+    return builder.initializeMap(120, cnst['START_POPULATION'], cnst['START_WAREHOUSE'], cnst['POP_CF'], 2400, 2400, 4, placement='poisson', seed=7)
+
+
+def test_floyd_warshall_matches_dijkstra(towns):
+    dense = allPairs(towns, 'floyd-warshall')
+    sparse = allPairs(towns, 'dijkstra', workers=1)
+
+    assert np.allclose(dense.distance, sparse.distance)
+
+
+def test_route_follows_roads_and_matches_distance(towns):
+    matrix = allPairs(towns)
+    for a, b in ((0, 119), (5, 60), (42, 42)):
+        route = matrix.route(a, b)
+        assert route[0] == a and route[-1] == b
+        assert all(towns.roads.has(u, v) for u, v in zip(route, route[1:]))
+        length = sum(np.hypot(float(towns.x[u]) - float(towns.x[v]), float(towns.y[u]) - float(towns.y[v])) for u, v in zip(route, route[1:]))
+        assert length == pytest.approx(matrix.cost(a, b), rel=1e-5)
+
+
+def test_pair_route_without_matrix_matches_matrix(towns):
+    towns.distances = None
+    distance, route = pairRoute(towns, 3, 100)
+    towns.distances = allPairs(towns)
+    cached_distance, cached_route = pairRoute(towns, 3, 100)
+    towns.distances = None
+
+    assert distance == pytest.approx(cached_distance, rel=1e-5)
+    assert route == cached_route
+
+
+def test_cached_map_memory_maps_its_matrices(tmp_path):
+    cnst = dict(builder.CNST, TOWN_NUM=60, WIDTH=1800, HEIGHT=1800)
+    built = mapcache.cachedMap(3, cnst, 4, 'poisson', cache_dir=str(tmp_path))
+    assert not list(tmp_path.glob('*.dist.npy'))  # nothing is computed before the first lookup
+
+    distance = built[0].distanceTo(built[59])
+    loaded = mapcache.cachedMap(3, cnst, 4, 'poisson', cache_dir=str(tmp_path))
+
+    assert isinstance(loaded.distances.matrix().distance, np.memmap)
+    assert np.array_equal(built.distances.matrix().distance, loaded.distances.matrix().distance)
+    assert loaded[0].distanceTo(loaded[59]) == pytest.approx(distance)
+
+
+def test_distance_matrix_round_trip(towns, tmp_path):
+    matrix = allPairs(towns)
+    mapcache.saveDistances(str(tmp_path / 'map'), matrix)
+    loaded = mapcache.loadDistances(str(tmp_path / 'map'))
+
+    assert np.array_equal(matrix.distance, loaded.distance)
+    assert np.array_equal(matrix.nextHop, loaded.nextHop)
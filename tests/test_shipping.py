@@ -0,0 +1,60 @@
+'''
+Tests of the weekly shipments between surplus and deficit towns.
+'''
+import numpy as np
+import pytest
+
+import builder
+import shipping
+
+
+def cnstWithTarget() -> dict:
+    # every town of population 1000 wants 4000 food and no goods
+    return dict(builder.CNST, FOOD_CONSUMPTION=1, GOODS_CONSUMPTION=0, RESERVE_WEEKS=4)
+
+
+def test_towns_above_target_ship_nothing(make_towns):
+    towns = make_towns([(0, 0), (100, 0), (200, 0)], food=[50000, 10000, 5000], roads=[(0, 1), (1, 2)], fee=0.1)
+    flows = shipping.weeklyShipping(towns, cnstWithTarget())
+
+    assert not flows.any()
+    assert list(towns.warehouse[:, 0]) == [50000, 10000, 5000]
+    assert not towns.saldo.any()
+
+
+def test_surplus_reaches_deficit_over_the_cheaper_route(make_towns):
+    # 0 -> 1 -> 3 is 200 long, 0 -> 2 -> 3 is about 283; towns 1 and 2 relay
+    towns = make_towns([(0, 0), (100, 0), (100, 200), (200, 0)], food=[6000, 4000, 4000, 1000], roads=[(0, 1), (1, 3), (0, 2), (2, 3)], fee=[0.0, 0.1, 0.5, 0.2])
+    cnst = cnstWithTarget()
+    flows = shipping.weeklyShipping(towns, cnst)
+
+    assert list(towns.warehouse[:, 0]) == [4000, 4000, 4000, 3000]
+    edges = [tuple(edge) for edge in towns.roads.edges.tolist()]
+    assert flows[edges.index((0, 1)), 0] == flows[edges.index((1, 3)), 0] == 2000
+    assert flows[edges.index((0, 2)), 0] == flows[edges.index((2, 3)), 0] == 0
+    tolls = 2000 * cnst['FOOD_PRICE'] * np.array([0.0, 0.1, 0.0, 0.2])
+    assert towns.saldo == pytest.approx(tolls - [tolls.sum(), 0, 0, 0])
+
+
+def test_road_capacity_limits_shipments(make_towns):
+    cnst = dict(cnstWithTarget(), ROAD_CAPACITY=100)
+    towns = make_towns([(0, 0), (cnst['MAX_ROAD_LENGTH'], 0)], food=[9000, 1000], roads=[(0, 1)], fee=0.1)
+    flows = shipping.weeklyShipping(towns, cnst)
+
+    assert flows[0, 0] == pytest.approx(100)
+    assert towns.warehouse[1, 0] == pytest.approx(1100)
+
+
+def test_shipping_conserves_stock_and_money():
+    cnst = builder.CNST
+    towns = builder.initializeMap(150, cnst['START_POPULATION'], cnst['START_WAREHOUSE'], cnst['POP_CF'], 2400, 2400, 4, placement='poisson', seed=3)
+    rng = np.random.default_rng(0)
+    towns.warehouse[:, 0] = rng.uniform(0, 2, len(towns)) * cnst['FOOD_CONSUMPTION'] * towns.population * cnst['RESERVE_WEEKS']
+    stock, saldo = towns.warehouse.sum(0), towns.saldo.sum()
+    flows = shipping.weeklyShipping(towns, cnst)
+
+    assert np.abs(flows[:, 0]).sum() > 0
+    assert np.allclose(towns.warehouse.sum(0), stock)
+    assert (towns.warehouse >= 0).all()
+    assert (np.abs(flows).sum(1) <= shipping.roadCapacity(towns.roads.lengths, cnst) + 1e-6).all()
+    assert towns.saldo.sum() == pytest.approx(saldo)
@@ -0,0 +1,26 @@
+'''
+Tests of seeded simulation runs and their cached maps.
+'''
+import numpy as np
+
+import builder
+from simulation import Simulation
+
+
+def test_seeded_simulation_is_reproducible():
+    towns = builder.initializeMap(40, 1000, [1000, 0], 0.15, 1400, 1000, 4, placement='poisson', seed=2)
+    first, second = Simulation(towns.fork(), seed=5), Simulation(towns.fork(), seed=5)
+    first.run_until(30)
+    second.run_until(30)
+
+    assert np.array_equal(first.towns.population, second.towns.population)
+
+
+def test_seeded_restart_loads_the_same_map_from_the_cache(tmp_path):
+    cnst = dict(builder.CNST, TOWN_NUM=40, WIDTH=1400, HEIGHT=1000)
+    first = Simulation.generate(cnst, 4, 'poisson', seed=2, cache_dir=str(tmp_path))
+    second = Simulation.generate(cnst, 4, 'poisson', seed=2, cache_dir=str(tmp_path))
+
+    assert len(list(tmp_path.glob('*.npz'))) == 1
+    assert np.array_equal(first.towns.roads.edges, second.towns.roads.edges)
+    assert np.array_equal(first.towns.x, second.towns.x)
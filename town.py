@@ -1,37 +1,94 @@
 from __future__ import annotations
 
+import numpy as np
+
+from roads import RoadNetwork
+from routing import HubRoutes, pairRoute
+
 class Town:
     '''
     Represents a town in the simulation with properties like population, warehouse, roads, etc.
+    A Town is a lightweight view onto one row of a TownTable.
     '''
 
+    __slots__ = ('table', 'index')
+
     archetypes = ['Collector', 'Laissez-Faire', 'Basic']
 
-    def __init__(self, name: str | int, population: int, warehouse: list, roads: list, road_count: int, x: int, y: int, isMain: bool, isAlive: bool, agentType: str) -> None:
+    def __init__(self, table: TownTable, index: int) -> None:
         '''
-        Initializes a Town object.
+        Initializes a Town view.
         
-        :param name: Name or identifier of the town
-        :param population: Population of the town
-        :param warehouse: List of warehouse items
-        :param roads: List of connected towns
-        :param road_count: Number of roads
-        :param x: X coordinate
-        :param y: Y coordinate
-        :param isMain: Whether this is the main town
-        :param isAlive: Whether the town is alive
-        :param agentType: Type of agent for the town
+        :param table: TownTable holding the town data
+        :param index: Row of the town in the table
         '''
-        self.name = name
-        self.population = population
-        self.warehouse = warehouse
-        self.roads = roads
-        self.road_count = road_count
-        self.x = x
-        self.y = y
-        self.isMain = isMain
-        self.isAlive = isAlive
-        self.AgentType = agentType
+        self.table = table
+        self.index = index
+
+    @property
+    def name(self) -> int:
+        return self.index
+
+    @property
+    def population(self) -> int:
+        return int(self.table.population[self.index])
+
+    @population.setter
+    def population(self, value: int) -> None:
+        self.table.population[self.index] = value
+
+    @property
+    def warehouse(self) -> np.ndarray:
+        return self.table.warehouse[self.index]
+
+    @warehouse.setter
+    def warehouse(self, value: list) -> None:
+        self.table.warehouse[self.index] = value
+
+    @property
+    def roads(self) -> list:
+        return [self.table[other] for other in self.table.roads.adjacency[self.index]]
+
+    @property
+    def road_count(self) -> int:
+        return self.table.roads.degree(self.index)
+
+    @property
+    def x(self) -> int:
+        return int(self.table.x[self.index])
+
+    @property
+    def y(self) -> int:
+        return int(self.table.y[self.index])
+
+    @property
+    def isMain(self) -> bool:
+        return bool(self.table.isMain[self.index])
+
+    @isMain.setter
+    def isMain(self, value: bool) -> None:
+        self.table.isMain[self.index] = value
+        self.table.mainVersion += 1
+
+    @property
+    def isAlive(self) -> bool:
+        return bool(self.table.isAlive[self.index])
+
+    @isAlive.setter
+    def isAlive(self, value: bool) -> None:
+        self.table.isAlive[self.index] = value
+
+    @property
+    def saldo(self) -> float:
+        return float(self.table.saldo[self.index])
+
+    @property
+    def fee(self) -> float:
+        return float(self.table.fee[self.index])
+
+    @property
+    def AgentType(self) -> str:
+        return Town.archetypes[self.table.archetype[self.index]]
 
     def __repr__(self) -> str:
         '''
@@ -48,12 +105,7 @@ class Town:
         :param other_town: The town to connect to
         :return: None
         '''
-        if other_town in self.roads:
-            return None
-        self.roads.append(other_town)
-        self.road_count += 1
-        other_town.roads.append(self)
-        other_town.road_count += 1
+        self.table.roads.add(self.index, other_town.index)
 
     def clearRoads(self) -> None:
         '''
@@ -61,11 +113,7 @@ class Town:
         
         :return: None
         '''
-        for other in self.roads:
-            other.roads.remove(self)
-            other.road_count -= 1
-        self.roads = []
-        self.road_count = 0
+        self.table.roads.clear(self.index)
 
     def removeRoad(self, other_town: 'Town') -> None:
         '''
@@ -74,41 +122,270 @@ class Town:
         :param other_town: The town to disconnect from
         :return: None
         '''
-        if other_town in self.roads:
-            self.roads.remove(other_town)
-            self.road_count -= 1
-            other_town.roads.remove(self)
-            other_town.road_count -= 1
+        self.table.roads.remove(self.index, other_town.index)
     
-    def findRoute(self, towns: list):
+    def findRoute(self, towns: TownTable) -> list:
         '''
         Find a route to the nearest Main town.
         
-        :param towns: List of towns
+        :param towns: Table of towns
+        :return: List of towns from this town to the Main town, empty if none is reachable
+        '''
+        return [towns[i] for i in towns.routes.route(self.index)]
+
+    def findRouteTo(self, other_town: Town) -> list:
+        '''
+        Find the shortest road route to another town.
+        
+        :param other_town: Destination town
+        :return: List of towns from this town to the destination, empty if it is unreachable
+        '''
+        return [self.table[i] for i in pairRoute(self.table, self.index, other_town.index)[1]]
+
+    def distanceTo(self, other_town: Town) -> float:
+        '''
+        Road distance to another town.
+        
+        :param other_town: Destination town
+        :return: Distance along the roads, inf if the town is unreachable
+        '''
+        return pairRoute(self.table, self.index, other_town.index)[0]
+        
+
+    def calculateSaldo(self, towns: TownTable) -> float:
+        '''
+        Saldo (treasury balance) of the town. It is computed for all towns at once by
+        economy.weeklyTick.
+        
+        :param towns: Table of towns
+        :return: Saldo
+        '''
+        return float(towns.saldo[self.index])
+
+    def calculateFee(self) -> float:
+        '''
+        Fee the town charges on goods shipped to it, computed by economy.weeklyTick.
+        
+        :return: Fee rate
+        '''
+        return self.fee
+
+
+
+class TownTable:
+    '''
+    Columnar (struct-of-arrays) storage of every town on the map. Whole-map calculations work on
+    the NumPy columns directly; iterating or indexing the table yields Town views.
+    '''
+    dynamicColumns = ('population', 'warehouse', 'isMain', 'isAlive', 'saldo', 'fee')  # change during a run
+    staticColumns = ('x', 'y', 'archetype')  # fixed once the map is generated
+
+    def __init__(self, capacity: int = 0, goods: int = 2) -> None:
+        '''
+        Initializes an empty TownTable.
+        
+        :param capacity: Number of rows to preallocate
+        :param goods: Number of warehouse goods per town
+        '''
+        self.size = 0
+        self.goods = goods
+        self.views = []
+        self.mainVersion = 0  # bump after writing to the isMain column directly
+        self._allocate(max(capacity, 1))
+        self.roads = RoadNetwork(self)
+        self.routes = HubRoutes(self)
+        self.distances = None  # cost()/route() lookups of the roads, a lazy mapcache.CachedDistances for cached maps
+
+    def _allocate(self, capacity: int) -> None:
+        '''
+        (Re)allocates column buffers, keeping the existing rows.
+        
+        :param capacity: New number of rows
+        :return: None
+        '''
+        buffers = {
+            '_population': np.zeros(capacity, dtype=np.int64),
+            '_warehouse': np.zeros((capacity, self.goods), dtype=np.float64),
+            '_x': np.zeros(capacity, dtype=np.int32),
+            '_y': np.zeros(capacity, dtype=np.int32),
+            '_isMain': np.zeros(capacity, dtype=np.bool_),
+            '_isAlive': np.zeros(capacity, dtype=np.bool_),
+            '_archetype': np.zeros(capacity, dtype=np.int8),
+            '_saldo': np.zeros(capacity, dtype=np.float64),
+            '_fee': np.zeros(capacity, dtype=np.float64),
+        }
+        for key, buffer in buffers.items():
+            if hasattr(self, key):
+                buffer[:self.size] = getattr(self, key)[:self.size]
+            setattr(self, key, buffer)
+        self.capacity = capacity
+        self._trim()
+
+    def _trim(self) -> None:
+        '''
+        Exposes the used part of every buffer as the public columns.
+        
+        :return: None
+        '''
+        self.population = self._population[:self.size]
+        self.warehouse = self._warehouse[:self.size]
+        self.x = self._x[:self.size]
+        self.y = self._y[:self.size]
+        self.isMain = self._isMain[:self.size]
+        self.isAlive = self._isAlive[:self.size]
+        self.archetype = self._archetype[:self.size]
+        self.saldo = self._saldo[:self.size]
+        self.fee = self._fee[:self.size]
+
+    def add(self, population: int, warehouse: list, x: int, y: int, isMain: bool, isAlive: bool, agentType: str) -> Town:
+        '''
+        Appends a town to the table.
+        
+        :param population: Population of the town
+        :param warehouse: List of warehouse items
+        :param x: X coordinate
+        :param y: Y coordinate
+        :param isMain: Whether this is the main town
+        :param isAlive: Whether the town is alive
+        :param agentType: Type of agent for the town
+        :return: Town view of the new row
+        '''
+        if self.size == self.capacity:
+            self._allocate(self.capacity * 2)
+        index = self.size
+        self._population[index] = population
+        self._warehouse[index] = warehouse
+        self._x[index] = x
+        self._y[index] = y
+        self._isMain[index] = isMain
+        self._isAlive[index] = isAlive
+        self._archetype[index] = Town.archetypes.index(agentType)
+        self.size += 1
+        self.mainVersion += 1
+        self._trim()
+        self.roads.grow(self.size)
+        self.views.append(Town(self, index))
+        return self.views[index]
+
+    def toArrays(self) -> dict:
+        '''
+        Exports the table and its roads as plain NumPy arrays.
+        
+        :return: Dictionary of column name to array
+        '''
+        return {
+            'population': self.population.copy(),
+            'warehouse': self.warehouse.copy(),
+            'x': self.x.copy(),
+            'y': self.y.copy(),
+            'isMain': self.isMain.copy(),
+            'isAlive': self.isAlive.copy(),
+            'archetype': self.archetype.copy(),
+            'saldo': self.saldo.copy(),
+            'fee': self.fee.copy(),
+            'edges': self.roads.edges.copy(),
+        }
+
+    def _share(self) -> TownTable:
+        '''
+        New table over the same map: the columns that change during a run are copied,
+        positions, archetypes and roads are shared.
+        
+        :return: TownTable
+        '''
+        table = TownTable.__new__(TownTable)
+        table.size = table.capacity = self.size
+        table.goods = self.goods
+        table.mainVersion = self.mainVersion
+        for key in TownTable.dynamicColumns:
+            setattr(table, '_' + key, getattr(self, key).copy())
+        for key in TownTable.staticColumns:
+            setattr(table, '_' + key, getattr(self, key).view())
+        table._trim()
+        table.views = [Town(table, i) for i in range(self.size)]
+        table.roads = self.roads
+        table.distances = self.distances
+        return table
+
+    def snapshot(self) -> TownTable:
+        '''
+        Read-only copy of the table that another thread can draw while this one keeps
+        simulating. The columns that change during a run are copied; positions, archetypes
+        and roads are shared.
+        
+        :return: TownTable with read-only columns
+        '''
+        table = self._share()
+        for key in TownTable.dynamicColumns + TownTable.staticColumns:
+            getattr(table, key).flags.writeable = False
+        table.routes = self.routes
+        return table
+
+    def fork(self) -> TownTable:
+        '''
+        Independent copy of the table for a branched run. Only the columns that change during
+        a run are copied; positions, archetypes and roads, which a run never changes, are
+        shared with this table.
+        
+        :return: TownTable
+        '''
+        table = self._share()
+        table.routes = HubRoutes(table)
+        return table
+
+    def loadColumns(self, arrays: dict) -> None:
         '''
-        pass
+        Overwrites the columns that change during a run with the ones exported by toArrays
+        from the same map.
         
+        :param arrays: Dictionary of column name to array
+        :return: None
+        '''
+        for key in TownTable.dynamicColumns:
+            getattr(self, key)[:] = arrays[key]
+        self.mainVersion += 1
 
-    def calculateSaldo(self, towns: list):
+    @classmethod
+    def fromArrays(cls, arrays: dict) -> TownTable:
         '''
-        Placeholder for calculating saldo (not implemented).
+        Rebuilds a table exported with toArrays.
         
-        :param towns: List of towns
+        :param arrays: Dictionary of column name to array
+        :return: TownTable
         '''
-        pass
+        n = len(arrays['x'])
+        table = cls(n, arrays['warehouse'].shape[1])
+        table.size = n
+        for key in ('population', 'warehouse', 'x', 'y', 'isMain', 'isAlive', 'archetype', 'saldo', 'fee'):
+            if key in arrays:
+                getattr(table, '_' + key)[:n] = arrays[key]
+        table._trim()
+        table.views = [Town(table, i) for i in range(n)]
+        table.roads.grow(n)
+        for a, b in np.asarray(arrays['edges']).tolist():
+            table.roads.add(a, b)
+        table.mainVersion += 1
+        return table
 
-    def calculateFee(self):
-        pass
+    def __len__(self) -> int:
+        return self.size
 
+    def __getitem__(self, index: int) -> Town:
+        return self.views[index]
+
+    def __iter__(self):
+        return iter(self.views)
+
+    def __repr__(self) -> str:
+        return f"TownTable({self.size} towns)"
 
 
-def CalculatePaths(towns: list) -> None:
+def CalculatePaths(towns: TownTable) -> None:
     '''
     Calculates paths for each town in the list of towns.
     
-    :param towns: List of Town objects
-    :type towns: list
+    :param towns: Table of towns
+    :type towns: TownTable
     :return: None
     '''
-    for town in towns:
-        town.calculatePaths(towns)
+    towns.routes.refresh()
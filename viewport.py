@@ -0,0 +1,180 @@
+'''
+Viewport module
+'''
+import math
+
+import numpy as np
+
+from spatial import PointGrid
+from town import TownTable
+
+MIN_ZOOM = 0.01
+MAX_ZOOM = 8.0
+LOD_TOWNS = 4000  # above this many visible towns roads are hidden and towns become single pixels
+DENSITY_FILL = 0.05  # above this many visible towns per screen pixel towns become density tiles
+
+
+class Camera:
+    '''
+    Maps world coordinates to the window: (x, y) is the world point in the top-left corner
+    and zoom is the number of screen pixels per world unit.
+    '''
+
+    def __init__(self, width: int, height: int, x: float = 0.0, y: float = 0.0, zoom: float = 1.0) -> None:
+        '''
+        Initializes a Camera.
+
+        :param width: Window width
+        :param height: Window height
+        :param x: World X of the top-left corner
+        :param y: World Y of the top-left corner
+        :param zoom: Screen pixels per world unit
+        '''
+        self.width = width
+        self.height = height
+        self.x = x
+        self.y = y
+        self.zoom = zoom
+
+    @property
+    def key(self) -> tuple:
+        '''
+        Hashable state of the camera, changes whenever the view changes.
+        '''
+        return (self.x, self.y, self.zoom, self.width, self.height)
+
+    def resize(self, width: int, height: int) -> None:
+        '''
+        Follows a window resize, keeping the top-left corner.
+
+        :param width: Window width
+        :param height: Window height
+        :return: None
+        '''
+        self.width = width
+        self.height = height
+
+    def fit(self, world_width: float, world_height: float) -> None:
+        '''
+        Shows the whole map, centred in the window.
+
+        :param world_width: Map width
+        :param world_height: Map height
+        :return: None
+        '''
+        self.zoom = min(max(min(self.width / world_width, self.height / world_height), MIN_ZOOM), MAX_ZOOM)
+        self.x = (world_width - self.width / self.zoom) / 2
+        self.y = (world_height - self.height / self.zoom) / 2
+
+    def pan(self, dx: float, dy: float) -> None:
+        '''
+        Moves the view by a number of screen pixels.
+
+        :param dx: Horizontal distance in pixels
+        :param dy: Vertical distance in pixels
+        :return: None
+        '''
+        self.x += dx / self.zoom
+        self.y += dy / self.zoom
+
+    def zoomAt(self, factor: float, px: float, py: float) -> None:
+        '''
+        Zooms by a factor, keeping the world point under a screen pixel in place.
+
+        :param factor: Zoom multiplier, above 1 zooms in
+        :param px: Screen X to zoom around
+        :param py: Screen Y to zoom around
+        :return: None
+        '''
+        wx, wy = self.screenToWorld(px, py)
+        self.zoom = min(max(self.zoom * factor, MIN_ZOOM), MAX_ZOOM)
+        self.x = wx - px / self.zoom
+        self.y = wy - py / self.zoom
+
+    def screenToWorld(self, px: float, py: float) -> tuple:
+        '''
+        Converts a screen pixel to world coordinates.
+
+        :param px: Screen X
+        :param py: Screen Y
+        :return: Tuple (world X, world Y)
+        '''
+        return self.x + px / self.zoom, self.y + py / self.zoom
+
+    def worldToScreen(self, xs: np.ndarray, ys: np.ndarray) -> tuple:
+        '''
+        Converts world coordinates to screen pixels.
+
+        :param xs: World X coordinates
+        :param ys: World Y coordinates
+        :return: Tuple (screen X int32 array, screen Y int32 array)
+        '''
+        sx = np.rint((np.asarray(xs) - self.x) * self.zoom).astype(np.int32)
+        sy = np.rint((np.asarray(ys) - self.y) * self.zoom).astype(np.int32)
+        return sx, sy
+
+    def visible(self, margin: float = 0.0) -> tuple:
+        '''
+        World rectangle shown in the window.
+
+        :param margin: Extra screen pixels around the window
+        :return: Tuple (x0, y0, x1, y1)
+        '''
+        pad = margin / self.zoom
+        return (self.x - pad, self.y - pad, self.x + self.width / self.zoom + pad, self.y + self.height / self.zoom + pad)
+
+
+class MapIndex:
+    '''
+    Spatial grids over the towns and road midpoints of one map, so culling and picking only
+    look at the grid cells on screen or under the cursor.
+    '''
+
+    def __init__(self, towns: TownTable) -> None:
+        '''
+        Builds the grids, about four towns per cell.
+
+        :param towns: Table of towns
+        '''
+        xs = towns.x.astype(np.float64)
+        ys = towns.y.astype(np.float64)
+        n = max(len(towns), 1)
+        area = (float(np.ptp(xs)) + 1.0) * (float(np.ptp(ys)) + 1.0) if len(towns) else 1.0
+        self.cell = max(math.sqrt(4 * area / n), 16.0)
+        self.towns = PointGrid(xs, ys, self.cell)
+
+        edges = towns.roads.edges
+        a, b = edges[:, 0], edges[:, 1]
+        self.roads = PointGrid((xs[a] + xs[b]) / 2, (ys[a] + ys[b]) / 2, self.cell)
+        self.reach = float(towns.roads.lengths.max()) / 2 if len(edges) else 0.0
+
+    def townsIn(self, rect: tuple) -> np.ndarray:
+        '''
+        Towns inside a world rectangle.
+
+        :param rect: Tuple (x0, y0, x1, y1)
+        :return: Array of town IDs
+        '''
+        return self.towns.inRect(*rect)
+
+    def roadsIn(self, rect: tuple) -> np.ndarray:
+        '''
+        Roads that may cross a world rectangle: those whose midpoint is within half the
+        longest road of it.
+
+        :param rect: Tuple (x0, y0, x1, y1)
+        :return: Array of road indices into RoadNetwork.edges
+        '''
+        x0, y0, x1, y1 = rect
+        return self.roads.inRect(x0 - self.reach, y0 - self.reach, x1 + self.reach, y1 + self.reach)
+
+    def pick(self, x: float, y: float, radius: float) -> int | None:
+        '''
+        Nearest town within radius of a world point.
+
+        :param x: World X
+        :param y: World Y
+        :param radius: Search radius in world units
+        :return: Town ID or None
+        '''
+        return self.towns.nearest(x, y, radius)